@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+'''Lines per second through `Translator`, as `langg translate --stdin` does
+
+Usage (from the repository root):
+
+    python bench/translate_throughput.py [--trace] [--cache-size N] ...
+
+Tracing sends every record to a null handler so only the cost of building
+ and formatting the records is measured
+'''
+
+import os
+import sys
+import time
+import argparse
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from langg.lib.ttop import TreeTop  # noqa: E402
+from langg.translate.translator import Translator  # noqa: E402
+from langg.util import consts  # noqa: E402
+from langg.util.namespace import Namespace  # noqa: E402
+
+
+def parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--dict', default='dicts/corncob_lowercase.txt',
+                        help='Dictionary to build the tree from')
+    parser.add_argument('--text', default='README.md',
+                        help='Text whose non-empty lines are translated')
+    parser.add_argument('--lines', type=int, default=5000,
+                        help='Number of lines to translate')
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help='Translator cache size, off by default')
+    parser.add_argument('--trace', action='store_true',
+                        help='Enable trace logging')
+    return parser
+
+
+def main() -> None:
+    args = parser().parse_args()
+
+    logging.addLevelName(consts.TRACE, 'TRACE')
+    logging.basicConfig(level=consts.TRACE if args.trace else logging.WARNING,
+                        handlers=[logging.NullHandler()])
+
+    ttop: TreeTop = TreeTop.for_bot(args.dict)
+    ttop.parse_infiles()
+    ttop.sort_trees()
+
+    with open(args.text, 'r') as f:
+        text: [str] = [line for line in f if line.strip()]
+    lines: [str] = (text * (args.lines // len(text) + 1))[:args.lines]
+
+    translator = Translator(ttop, Namespace(op_data=Namespace(
+        seed=None, tree=0, txt=None, txt_in=None,
+        cache_size=args.cache_size)))
+
+    start: float = time.perf_counter()
+    for line in lines:
+        Translator.to_text(translator._translate([line]))
+    elapsed: float = time.perf_counter() - start
+
+    print(f'{len(lines)} lines in {elapsed:.3f}s: '
+          f'{len(lines) / elapsed:.0f} lines/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 from .util import argp
+from .util import consts
 
 import os
 import sys
@@ -25,7 +26,10 @@ def main():
         parser.print_help()
         sys.exit(0)
 
-    log.basicConfig(level=(os.getenv('LOG_LEVEL') or _args.log).upper())
+    log.addLevelName(consts.TRACE, 'TRACE')
+    level: str = 'TRACE' if _args.trace else (
+        os.getenv('LOG_LEVEL') or _args.log).upper()
+    log.basicConfig(level=level)
 
     args = vars(_args)
 
@@ -5,23 +5,35 @@ from discord.ext.commands import (
 from .message_util import (MSG, EMBED)
 from . import message_util as msg
 from ..lib.ttop import TreeTop
+from ..lib import tree_store
+from ..lib.tree_store import (TreeStore, TREE_STORE_DIRNAME)
 from ..translate.translator import Translator
 from ..util import namespace_ext as ns_ext
-from ..util.cleaning_dict import TimingDict
+from ..util.cleaning_dict import CleaningDict
 from .user_data import (UserData, USER_DATA_BASENAME)
+from .job_runner import (JobRunner, JobQueueFull)
+from .persistence import WriteBehind
+from .user_index import UserIndex
 
 import os
-import re
 import json
+import time
+import shutil
 import logging
+import tempfile
+from concurrent.futures import (Future, as_completed)
 from pathlib import Path
 from types import SimpleNamespace
+from typing import Optional
 
 LOG: logging.Logger = logging.getLogger('bot')
 
 
 class BotWrapper:
     def __init__(self, op_data: dict, command_prefix: str = '!'):
+        # For the time to ready, see `on_ready`
+        self.started: float = time.perf_counter()
+
         self.bot = Bot(command_prefix=command_prefix, help_command=None)
 
         self.token: str = op_data.token or os.getenv('DISCORD_BOT_TOKEN')
@@ -33,38 +45,147 @@ class BotWrapper:
         if not self.storage_dir:
             raise Exception('Discord bot storage dir not provided')
 
-        self.data: TimingDict[str, UserData] = TimingDict()
+        # Trees of idle users are dropped and reloaded on their next access,
+        #  the rest of their data stays
+        self.data: CleaningDict[str, UserData] = CleaningDict(
+            ttl=op_data.user_ttl, max_loaded=op_data.max_loaded_users,
+            loader=self._load_user, unloader=UserData.unload)
 
-    def load_from_storage(self) -> None:
-        log_prefix: str = 'load_from_storage:'
-        LOG.info(f'{log_prefix} Loading data from storage')
-        for root, dirs, _ in os.walk(self.storage_dir):
-            for dir in dirs:
-                username: str = str(dir)
-                LOG.info(f'{log_prefix} Found data for {username}')
-
-                user_data_fn: str = os.path.join(root, dir, USER_DATA_BASENAME)
-                if not os.path.isfile(user_data_fn):
-                    LOG.warn(f'{log_prefix} Data directory for {username} ' +
-                             'contains no user data file')
-                    continue
+        # Every userhash in `data`, for globs and user tags
+        self.users = UserIndex()
 
-                with open(user_data_fn, 'r') as f:
-                    user_data = UserData.from_dict(json.load(f))
+        # Trees shared by all users who uploaded the same words
+        self.trees = TreeStore(
+            os.path.join(self.storage_dir, TREE_STORE_DIRNAME))
 
-                ttop: TreeTop = TreeTop.from_protobuf(user_data.proto_fn)
-                if not ttop:
-                    continue
+        self.writer = WriteBehind(self.data, op_data.write_delay)
 
-                user_data.translator = Translator.for_bot(ttop, username)
+        self.jobs = JobRunner(
+            executor=op_data.executor, workers=op_data.workers,
+            max_queue=op_data.max_queue,
+            max_user_queue=op_data.max_user_queue)
 
-                LOG.info(
-                    f'{log_prefix} Successfully loaded data for {username}')
+    def load_from_storage(self, preload: bool = False) -> None:
+        '''Index the users in the storage dir
 
+        Only the user data files are read, trees are loaded on first use;
+         with `preload` every distinct tree is also loaded now, in parallel
+         in the job pool
+        '''
+
+        log_prefix: str = 'load_from_storage:'
+        LOG.info(f'{log_prefix} Loading data from storage')
+        start: float = time.perf_counter()
+
+        users: [(str, UserData)] = []
+        for entry in os.scandir(self.storage_dir):
+            if not entry.is_dir() or entry.name == TREE_STORE_DIRNAME:
+                continue
+            username: str = entry.name
+            user_start: float = time.perf_counter()
+
+            user_data: UserData = self._read_user(username)
+            if user_data is None:
+                LOG.warn(f'{log_prefix} Data directory for {username} ' +
+                         'contains no user data file')
+                continue
+
+            self.data.set_unloaded(username, user_data)
+            self.users.add(username)
+            users.append((username, user_data))
+            LOG.info(f'{log_prefix} Indexed {username} in '
+                     f'{time.perf_counter() - user_start:.3f}s')
+
+        LOG.info(f'{log_prefix} Indexed {len(users)} users in '
+                 f'{time.perf_counter() - start:.3f}s')
+
+        if preload:
+            self._preload(users)
+
+    def _preload(self, users: [(str, UserData)]) -> None:
+        log_prefix: str = '_preload:'
+        start: float = time.perf_counter()
+
+        digests: set[str] = {
+            self.trees.digest_of(user_data.proto_fn)
+            for _, user_data in users if user_data.proto_fn}
+        digests.discard(None)
+
+        trees: dict[str, TreeTop] = {}
+        futures: dict[Future, str] = {
+            self.jobs.executor.submit(
+                tree_store.load, self.trees.path(digest)): digest
+            for digest in digests}
+        for future in as_completed(futures):
+            digest: str = futures[future]
+            ttop, secs = future.result()
+            if ttop:
+                trees[digest] = self.trees.add(digest, ttop)
+                LOG.info(f'{log_prefix} Loaded tree {digest} in {secs:.3f}s')
+
+        for username, user_data in users:
+            ttop: TreeTop = trees.get(
+                self.trees.digest_of(user_data.proto_fn or ''))
+            if ttop:
+                user_data.translator = Translator.for_bot(ttop, username)
                 self.data[username] = user_data
 
+        LOG.info(f'{log_prefix} Loaded {len(trees)} trees in '
+                 f'{time.perf_counter() - start:.3f}s')
+
+    def _read_user(self, username: str) -> Optional[UserData]:
+        '''Read the data file of `username`, without the tree'''
+
+        user_data_fn: str = os.path.join(
+            self.storage_dir, username, USER_DATA_BASENAME)
+        if not os.path.isfile(user_data_fn):
+            return None
+        with open(user_data_fn, 'r') as f:
+            user_data: UserData = UserData.from_dict(json.load(f))
+
+        if user_data.proto_fn \
+                and self.trees.digest_of(user_data.proto_fn) is None \
+                and os.path.isfile(user_data.proto_fn) \
+                and os.path.isfile(user_data.raw_fn or ''):
+            # Written before trees were shared
+            digest: str = self.trees.adopt(
+                user_data.raw_fn, user_data.proto_fn)
+            user_data.proto_fn = self.trees.path(digest)
+            user_data.write()
+
+        return user_data
+
+    def _load_user(self, username: str,
+                   user_data: Optional[UserData]) -> Optional[UserData]:
+        '''Loader of :attr:`data`
+
+        Reads the user data from the storage dir if not given, then the tree
+         and translator if not loaded
+        '''
+
+        if user_data is None:
+            user_data = self._read_user(username)
+            if user_data is None:
+                return None
+
+        if user_data.proto_fn and not user_data.translator:
+            start: float = time.perf_counter()
+            digest: str = self.trees.digest_of(user_data.proto_fn)
+            ttop: TreeTop = self.trees.get(digest) if digest else \
+                TreeTop.from_protobuf(user_data.proto_fn, compact=True)
+            if ttop:
+                user_data.translator = Translator.for_bot(ttop, username)
+                LOG.info(f'_load_user: Loaded tree for {username} in '
+                         f'{time.perf_counter() - start:.3f}s')
+
+        return user_data
+
     def run(self) -> None:
-        self.bot.run(self.token)
+        self.bot.loop.create_task(self.writer.run())
+        try:
+            self.bot.run(self.token)
+        finally:
+            self.writer.flush_sync()
 
     ##########################################################################
     # Bot setup
@@ -98,6 +219,11 @@ class BotWrapper:
 
     def set_bot_events(self):
 
+        @self.bot.event
+        async def on_ready() -> None:
+            LOG.info(f'on_ready: Ready in '
+                     f'{time.perf_counter() - self.started:.3f}s')
+
         @self.bot.event
         async def on_command_error(ctx: Context, error: CommandError) -> None:
             log_prefix: str = f'on_command_error:{str(ctx.author)}:'
@@ -143,18 +269,29 @@ class BotWrapper:
 
     def _userhash_check_glob(self, userhash: str, _solved: dict) -> str:
         if '*' in userhash:
-            userhash_glob: str = userhash.replace('*', '.*')
-            userhash_re = re.compile(userhash_glob)
-            for k in _solved.keys():
-                if userhash_re.match(k):
-                    userhash = k
+            return self.users.match(userhash, _solved) or userhash
         return userhash
 
     async def _tag_to_userhash(self, tag: str) -> str:
         untagged: str = msg.untag_user_id(tag)
         if not untagged.isnumeric():
             return untagged
-        return str(await self.bot.fetch_user(untagged))
+
+        userhash: str = self.users.userhash_of(untagged)
+        if userhash is None:
+            # The client's cache first, `fetch_user` is a request
+            user = self.bot.get_user(int(untagged)) \
+                or await self.bot.fetch_user(untagged)
+            userhash = str(user)
+            self.users.remember(untagged, userhash)
+        return userhash
+
+    async def _send_busy(self, ctx: Context, title: str) -> None:
+        await ctx.send(embed=msg.embed(
+            title=title,
+            desc=msg.tag_author(ctx),
+            fields=[(EMBED.sub.error, MSG.errors.busy)]))
+        LOG.info(f'{str(ctx.author)}: Job queue full')
 
     async def cmd_help(self, ctx: Context, *input) -> None:
         embed = Embed(title='Langg Bot Help')
@@ -188,7 +325,16 @@ class BotWrapper:
             LOG.debug(f'{log_prefix} No attachment sent')
             return
 
-        attachment: Attachment = attachments[0]
+        try:
+            async with self.jobs.user_slot(username):
+                await self._cmd_dictionary(ctx, attachments[0])
+        except JobQueueFull:
+            await self._send_busy(ctx, EMBED.title.dictionary)
+
+    async def _cmd_dictionary(self, ctx: Context,
+                              attachment: Attachment) -> None:
+        username: str = str(ctx.author)
+        log_prefix: str = f'cmd_dictionary:{username}:'
 
         path_fn: Path = (Path(self.storage_dir)
                          .joinpath(str(ctx.author))
@@ -197,42 +343,75 @@ class BotWrapper:
         raw_fn: str = str(path_fn.with_suffix('.dict.txt'))
         os.makedirs(os.path.dirname(raw_fn), exist_ok=True)
 
-        await attachment.save(raw_fn)
-        LOG.info(f'{log_prefix} Attachment saved to: {raw_fn}')
-
-        ttop = TreeTop.for_bot(raw_fn)
-        LOG.info(f'{log_prefix} TreeTop created')
-        ttop.parse_infiles()
-        LOG.info(f'{log_prefix} Infiles parsed')
-        ttop.sort_trees()
-
-        proto_fn: str = str(path_fn.with_suffix('.proto'))
-
-        ttop.write_protobuf(proto_fn)
-        LOG.info(f'{log_prefix} Protobuf written to: {proto_fn}')
-
+        # The previous upload and its tree, if loaded, let the build only
+        #  apply the words which changed
+        old: UserData = self.data.peek(username)
+        old_raw_fn: str = old.raw_fn if old else None
+        old_ttop: TreeTop = \
+            old.translator.ttop if old and old.translator else None
+        old_digest: str = self.trees.digest_of(old.proto_fn) if old else None
+        # An upload of the same name is moved out of the user's storage
+        #  while the new one is built against it, and put back if the save
+        #  or the build fails so that it still matches the user's tree
+        prev_fn: str = None
+        if old_raw_fn == raw_fn and os.path.isfile(raw_fn):
+            fd, prev_fn = tempfile.mkstemp(suffix='.dict.txt')
+            os.close(fd)
+            shutil.move(raw_fn, prev_fn)
+            old_raw_fn = prev_fn
+
+        try:
+            await attachment.save(raw_fn)
+            LOG.info(f'{log_prefix} Attachment saved to: {raw_fn}')
+
+            digest, ttop = await self.jobs.run(
+                tree_store.build, raw_fn, self.trees.root_dir,
+                old_raw_fn, old_ttop, old_digest)
+        except BaseException:
+            if prev_fn is not None:
+                shutil.move(prev_fn, raw_fn)
+            elif os.path.isfile(raw_fn):
+                os.remove(raw_fn)
+            raise
+        if prev_fn is not None:
+            os.remove(prev_fn)
+        if ttop is None:
+            ttop = await self.jobs.run_in_thread(self.trees.get, digest)
+        else:
+            ttop = self.trees.add(digest, ttop)
+        if ttop is None:
+            raise Exception(f'Tree {digest} missing from the store')
+        LOG.info(f'{log_prefix} Tree ready: {digest}')
+
+        proto_fn: str = self.trees.path(digest)
         translator = Translator.for_bot(ttop, username)
 
-        if username in self.data:
+        solved: dict = {}
+        if old and old.proto_fn == proto_fn:
+            # Same words, same language
+            solved = old.solved
+        elif old:
             LOG.info(f'Removing solved data for {username}')
             await ctx.send(embed=msg.embed(
                 title=EMBED.title.dictionary,
                 desc=MSG.tag.everyone,
                 fields=[(EMBED.sub.warning,
-                         MSG.errors.abandon(msg.tag_author(ctx)))]))
+                         MSG.data.abandon(msg.tag_author(ctx)))]))
             for k, v in self.data.items():
                 if k == username:
                     continue
-                if v and v.solved and k in v.solved:
+                if v and v.solved and username in v.solved:
                     LOG.debug(f'{k} had solved words for {username}')
-                    v.solved[k] = {}
+                    v.clear_solved(username)
+                    self.writer.mark(k)
 
         self.data[username] = UserData(
-            raw_fn=raw_fn, proto_fn=proto_fn, translator=translator)
+            raw_fn=raw_fn, proto_fn=proto_fn, solved=solved,
+            translator=translator)
+        self.users.add(username)
         LOG.info(f'{log_prefix} UserData loaded')
 
-        self.data[username].write()
-        LOG.info(f'{log_prefix} UserData written')
+        self.writer.mark(username)
 
         await ctx.send(embed=msg.embed(
             title=EMBED.title.dictionary,
@@ -255,19 +434,31 @@ class BotWrapper:
                       'did not send a message')
             return
 
-        if username not in self.data or not self.data[username].translator:
-            await ctx.send(embed=msg.embed(
-                title=EMBED.title.message,
-                desc=msg.tag_author(ctx),
-                fields=[
-                    (EMBED.sub.error, MSG.data.no_dict),
-                    (EMBED.sub.help, MSG.help.message)]))
-            LOG.debug(f'{log_prefix} Has not created a dictionary')
-            return
-
         message: str = cmd_parts[1]
 
-        sto: str = self.data[username].translator.translate_text(message)
+        try:
+            async with self.jobs.user_slot(username):
+                # Loads the tree if it was dropped
+                user_data: UserData = await self.jobs.run_in_thread(
+                    self.data.get, username)
+                translator: Translator = \
+                    user_data.translator if user_data else None
+                if not translator:
+                    await ctx.send(embed=msg.embed(
+                        title=EMBED.title.message,
+                        desc=msg.tag_author(ctx),
+                        fields=[
+                            (EMBED.sub.error, MSG.data.no_dict),
+                            (EMBED.sub.help, MSG.help.message)]))
+                    LOG.debug(f'{log_prefix} Has not created a dictionary')
+                    return
+
+                sto: str = await self.jobs.run_in_thread(
+                    translator.translate_text, message)
+        except JobQueueFull:
+            await self._send_busy(ctx, EMBED.title.message)
+            return
+
         LOG.debug(f'{log_prefix} Message to be sent {sto}')
 
         await ctx.send(embed=msg.embed(
@@ -282,8 +473,9 @@ class BotWrapper:
 
         if username not in self.data:
             self.data[username] = UserData()
+            self.users.add(username)
 
-        _solved: dict = self.data[username].solved
+        _solved: dict = self.data.peek(username).solved
 
         if (len(cmd_parts) != 4):
             await ctx.send(embed=msg.embed(
@@ -321,10 +513,7 @@ class BotWrapper:
             LOG.info(f'{log_prefix} Specified user ({userhash}) has no data')
             return
 
-        if userhash not in _solved:
-            _solved[userhash] = {}
-
-        _solved[userhash][wfrom] = wto
+        self.data.peek(username).add_solved(userhash, wfrom, wto)
 
         await ctx.send(embed=msg.embed(
             title=EMBED.title.solve,
@@ -333,8 +522,7 @@ class BotWrapper:
                      (msg.tag_author(ctx) + ' ' +
                       "thinks they've solved a word!"))]))
 
-        self.data[username].write()
-        LOG.info(f'{log_prefix} UserData written')
+        self.writer.mark(username)
 
     async def cmd_solved(self, ctx: Context) -> None:
         username: str = str(ctx.author)
@@ -351,7 +539,7 @@ class BotWrapper:
             LOG.info(f'{log_prefix} Attempt to dump solved with no data')
             return
 
-        _solved: dict = self.data[username].solved
+        _solved: dict = self.data.peek(username).solved
         if len(cmd_parts) == 0:
             await ctx.send(embed=msg.embed(
                 title=EMBED.title.solved,
@@ -445,7 +633,7 @@ class BotWrapper:
             LOG.debug(f'{log_prefix} Has not created a dictionary')
             return
 
-        _solved: dict = self.data[username].solved
+        _solved: dict = self.data.peek(username).solved
 
         userhash = self._userhash_check_glob(
             await self._tag_to_userhash(cmd_parts[1]),
@@ -462,34 +650,10 @@ class BotWrapper:
             return
 
         sfrom: str = cmd_parts[2]
-        sto: str = ''
+        sto: str = sfrom
         if userhash in _solved:
-            for wfrom, wto in _solved[userhash].items():
-                wfrom_re: re.Pattern = re.compile(
-                    f'(^| )({wfrom})( |$)', re.IGNORECASE)
-                ridx: int = 0
-                for match in wfrom_re.finditer(sfrom):
-                    # Note: `2` for middle group in the regex
-                    span: (int, int) = match.span(2)
-                    sto += sfrom[ridx:span[0]]
-                    orig_word: str = sfrom[span[0]:span[1]]
-
-                    ridx = span[1]
-
-                    upper_idx_pos: [float] = [
-                        i / len(orig_word) for i in range(len(orig_word))
-                        if orig_word[i].isupper()]
-
-                    for pos in upper_idx_pos:
-                        new_pos: int = int(pos * len(wto))
-                        wto = wto[:new_pos] + wto[new_pos].upper() + \
-                            wto[new_pos + 1:]
-
-                    sto += msg.bold(wto)
-                sto += sfrom[ridx: len(sfrom)]
-
-        if sto == '':
-            sto = sfrom
+            sto = self.data.peek(username).solved_index(userhash) \
+                .substitute(sfrom)
 
         await ctx.author.send(embed=msg.embed(
             title=EMBED.title.translate,
@@ -503,7 +667,7 @@ def run(args_dict: dict) -> None:
 
     bot = BotWrapper(args.op_data)
 
-    bot.load_from_storage()
+    bot.load_from_storage(args.op_data.preload)
 
     bot.set_bot_commands()
     bot.set_bot_events()
@@ -511,6 +675,8 @@ def run(args_dict: dict) -> None:
 
     LOG.info('Started, awaiting input...')
 
-    bot.run()  # Blocks
-
-    bot.data.timer.cancel()
+    try:
+        bot.run()  # Blocks
+    finally:
+        bot.data.timer.cancel()
+        bot.jobs.shutdown()
@@ -0,0 +1,106 @@
+from ..util import consts
+
+import asyncio
+import logging
+from functools import partial
+from contextlib import asynccontextmanager
+from concurrent.futures import (Executor, ProcessPoolExecutor,
+                                ThreadPoolExecutor)
+from typing import (AsyncIterator, Callable, TypeVar)
+
+LOG: logging.Logger = logging.getLogger('job_runner')
+
+T = TypeVar('T')
+
+EXECUTORS: [str] = ['process', 'thread']
+
+
+class JobQueueFull(Exception):
+    '''Raised by :meth:`JobRunner.user_slot` when no more jobs can queue'''
+
+
+class JobRunner:
+    '''Runs CPU-heavy bot work off the event loop
+
+    Commands take a per-user slot with :meth:`user_slot`, so the jobs of one
+     user run one after the other (an upload is never read while being
+     replaced), then hand the work to :meth:`run` or :meth:`run_in_thread`;
+     the event loop keeps serving other users and the gateway meanwhile
+
+    Attributes:
+
+        executor: Pool for self-contained jobs, such as building a tree from
+            a file; its args and results are pickled when it is a
+            `ProcessPoolExecutor`
+
+        threads: Pool for jobs using objects which live in the bot process,
+            such as a user's translator
+
+        max_queue: Max jobs queued or running over all users
+
+        max_user_queue: Max jobs queued or running per user
+    '''
+
+    def __init__(self, executor: str = 'process', workers: int = None,
+                 max_queue: int = consts.DEFAULT_BOT_MAX_QUEUE,
+                 max_user_queue: int = consts.DEFAULT_BOT_MAX_USER_QUEUE):
+        if executor not in EXECUTORS:
+            raise Exception(f'Unknown executor type: {executor}')
+
+        self.executor: Executor = (
+            ProcessPoolExecutor if executor == 'process'
+            else ThreadPoolExecutor)(max_workers=workers)
+        self.threads: Executor = ThreadPoolExecutor(max_workers=workers)
+        self.max_queue: int = max_queue
+        self.max_user_queue: int = max_user_queue
+
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._queued: dict[str, int] = {}
+
+    def queued(self, user: str = None) -> int:
+        '''Jobs queued or running for `user`, or for everyone'''
+
+        if user is None:
+            return sum(self._queued.values())
+        return self._queued.get(user, 0)
+
+    @asynccontextmanager
+    async def user_slot(self, user: str) -> AsyncIterator[None]:
+        '''Wait for the previous jobs of `user` to finish
+
+        Raises :class:`JobQueueFull` straight away, without waiting, if the
+         user or the bot already has too many jobs queued
+        '''
+
+        if (self.queued(user) >= self.max_user_queue
+                or self.queued() >= self.max_queue):
+            raise JobQueueFull(f'Too many jobs queued for {user}')
+
+        self._queued[user] = self.queued(user) + 1
+        lock: asyncio.Lock = self._locks.setdefault(user, asyncio.Lock())
+        try:
+            async with lock:
+                yield
+        finally:
+            self._queued[user] -= 1
+            if not self._queued[user]:
+                # Nobody else is waiting on the lock
+                del self._queued[user]
+                del self._locks[user]
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        '''Run `fn(*args)` in :attr:`executor`'''
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, partial(fn, *args))
+
+    async def run_in_thread(self, fn: Callable[..., T], *args) -> T:
+        '''Run `fn(*args)` in :attr:`threads`'''
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self.threads, partial(fn, *args))
+
+    def shutdown(self) -> None:
+        LOG.info('Shutting down job executors')
+        self.executor.shutdown(cancel_futures=True)
+        self.threads.shutdown(cancel_futures=True)
@@ -57,6 +57,7 @@ MSG = Namespace(
         invalid_args='Invalid number of arguments',
         no_attachment='No attachment in command',
         no_message='No message to send provided',
+        busy='Still working on your previous commands, try again shortly',
     ),
     data=Namespace(
         no_dict='No dictionary loaded for user',
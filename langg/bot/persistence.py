@@ -0,0 +1,89 @@
+from .user_data import UserData
+from ..util import atomic_file
+from ..util.cleaning_dict import CleaningDict
+
+import asyncio
+import logging
+
+LOG: logging.Logger = logging.getLogger('persistence')
+
+
+class WriteBehind:
+    '''Writes changed user data in the background, off the event loop
+
+    Commands only :meth:`mark` a user as changed; once `delay` seconds have
+     passed since a mark, every user marked by then is serialised on the
+     loop (a consistent snapshot, and cheap) and written from a thread, each
+     file atomically. A burst of commands costs one write per user
+
+    Attributes:
+
+        data: User data of the bot, see :class:`langg.bot.bot.BotWrapper`
+
+        delay: Seconds to wait after a mark so that later changes are
+            written with it
+
+        dirty: Users changed since their last write
+    '''
+
+    def __init__(self, data: CleaningDict, delay: float):
+        self.data: CleaningDict = data
+        self.delay: float = delay
+        self.dirty: set[str] = set()
+        self._wake: asyncio.Event = None
+
+    def mark(self, username: str) -> None:
+        '''Schedule a write of `username`'s data, call from the event loop'''
+
+        self.dirty.add(username)
+        if self._wake:
+            self._wake.set()
+
+    async def run(self) -> None:
+        '''Background task flushing marked users, see :meth:`flush`'''
+
+        self._wake = asyncio.Event()
+        if self.dirty:
+            self._wake.set()
+        while True:
+            await self._wake.wait()
+            await asyncio.sleep(self.delay)
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                LOG.error(f'Writing user data failed: {e}')
+
+    async def flush(self) -> None:
+        '''Write the marked users from a thread'''
+
+        writes: [(str, str)] = self._take()
+        if writes:
+            await asyncio.get_running_loop().run_in_executor(
+                None, _write_all, writes)
+
+    def flush_sync(self) -> None:
+        '''Write the marked users now, for shutdown'''
+
+        _write_all(self._take())
+
+    def _take(self) -> [(str, str)]:
+        dirty: set[str] = self.dirty
+        self.dirty = set()
+
+        writes: [(str, str)] = []
+        for username in dirty:
+            user_data: UserData = self.data.peek(username)
+            if user_data is None:
+                continue
+            if not user_data.raw_fn:
+                LOG.warning(f'No storage for {username}, not written')
+                continue
+            writes.append((user_data.path(), user_data.to_json()))
+        return writes
+
+
+def _write_all(writes: [(str, str)]) -> None:
+    for fn, text in writes:
+        atomic_file.write_text(fn, text)
+        LOG.debug(f'Written: {fn}')
@@ -0,0 +1,46 @@
+from . import message_util as msg
+
+
+class SolvedIndex:
+    '''The words one user has solved in another user's language
+
+    Kept beside :attr:`langg.bot.user_data.UserData.solved` and updated on
+     each solve so that a message is translated with one dict lookup per
+     space separated word, whatever the number of solved words
+
+    Attributes:
+
+        words: Lowercase solved word to its solution
+    '''
+
+    def __init__(self, solved: dict[str, str]):
+        self.words: dict[str, str] = {}
+        for wfrom, wto in solved.items():
+            self.add(wfrom, wto)
+
+    def add(self, wfrom: str, wto: str) -> None:
+        self.words[wfrom.lower()] = wto
+
+    def substitute(self, text: str) -> str:
+        '''Swap each solved word of `text` for its solution, in bold
+
+        Words are separated by spaces and matched ignoring case; the
+         positions of capitals in a solved word are carried over to its
+         solution
+        '''
+
+        words: dict[str, str] = self.words
+        tokens: [str] = text.split(' ')
+        for i, token in enumerate(tokens):
+            wto: str = words.get(token.lower())
+            if wto is not None:
+                tokens[i] = msg.bold(_match_case(token, wto))
+        return ' '.join(tokens)
+
+
+def _match_case(orig_word: str, wto: str) -> str:
+    for i, c in enumerate(orig_word):
+        if c.isupper():
+            new_pos: int = int(i / len(orig_word) * len(wto))
+            wto = wto[:new_pos] + wto[new_pos].upper() + wto[new_pos + 1:]
+    return wto
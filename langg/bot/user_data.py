@@ -4,6 +4,8 @@ import os
 import json
 
 from ..translate.translator import Translator
+from .solved_index import SolvedIndex
+from ..util import atomic_file
 
 USER_DATA_BASENAME: str = 'user-data.json'
 
@@ -12,14 +14,17 @@ class UserData:
     def __init__(self,
                  raw_fn: str = None,
                  proto_fn: str = None,
-                 solved: dict = {},
+                 solved: dict = None,
                  translator: Translator = None):
 
         self.raw_fn: str = raw_fn
         self.proto_fn: str = proto_fn
         self.translator: Translator = translator
 
-        self.solved: dict = solved
+        # Not a `{}` default, which every instance would share
+        self.solved: dict = solved if solved is not None else {}
+        # Built on first use per userhash, see `solved_index`
+        self._indices: dict[str, SolvedIndex] = {}
 
     @classmethod
     def from_dict(cls, d: dict) -> UserData:
@@ -28,14 +33,45 @@ class UserData:
             proto_fn=d['proto_fn'],
             solved=d['solved'])
 
+    def unload(self) -> None:
+        '''Drop the translator and its tree, the bot reloads them on use'''
+
+        self.translator = None
+
+    def add_solved(self, userhash: str, wfrom: str, wto: str) -> None:
+        self.solved.setdefault(userhash, {})[wfrom] = wto
+        if userhash in self._indices:
+            self._indices[userhash].add(wfrom, wto)
+
+    def clear_solved(self, userhash: str) -> None:
+        self.solved[userhash] = {}
+        self._indices.pop(userhash, None)
+
+    def solved_index(self, userhash: str) -> SolvedIndex:
+        '''Words solved in the language of `userhash`, for translating'''
+
+        index: SolvedIndex = self._indices.get(userhash)
+        if index is None:
+            index = SolvedIndex(self.solved.get(userhash, {}))
+            self._indices[userhash] = index
+        return index
+
     def dict_no_trn(self) -> dict:
         d: dict = self.__dict__.copy()
         del d['translator']
+        del d['_indices']
         return d
 
-    def write(self) -> None:
-        fn: str = os.path.join(
+    def path(self) -> str:
+        return os.path.join(
             os.path.dirname(self.raw_fn),
             USER_DATA_BASENAME)
-        with open(fn, 'w') as f:
-            f.write(json.dumps(self.dict_no_trn(), indent=2))
+
+    def to_json(self) -> str:
+        return json.dumps(self.dict_no_trn(), indent=2)
+
+    def write(self) -> None:
+        '''Write now, the bot defers this to
+         :class:`langg.bot.persistence.WriteBehind`'''
+
+        atomic_file.write_text(self.path(), self.to_json())
@@ -0,0 +1,80 @@
+from ..util import consts
+
+import re
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import (Container, Optional)
+
+
+class UserIndex:
+    '''Userhashes known to the bot, for resolving user globs and tags
+
+    Globs only match from the start of a userhash, so the candidates of a
+     glob are the range of the sorted userhashes starting with the text
+     before its first `*`, found by bisection; Discord user IDs are
+     remembered for `ttl` seconds so that repeated tags of a user don't
+     each cost a `fetch_user` round trip
+
+    Attributes:
+
+        names: Sorted userhashes
+
+        ttl: Seconds a user ID stays resolved
+    '''
+
+    def __init__(self, ttl: float = consts.DEFAULT_BOT_USER_ID_TTL):
+        self.names: [str] = []
+        self.ttl: float = ttl
+        # User ID to userhash and when it was resolved
+        self._ids: dict[str, (str, float)] = {}
+
+    def add(self, userhash: str) -> None:
+        i: int = bisect_left(self.names, userhash)
+        if i == len(self.names) or self.names[i] != userhash:
+            self.names.insert(i, userhash)
+
+    def prefixed(self, prefix: str) -> [str]:
+        '''The userhashes starting with `prefix`'''
+
+        lo: int = bisect_left(self.names, prefix)
+        hi: int = lo
+        while hi < len(self.names) and self.names[hi].startswith(prefix):
+            hi += 1
+        return self.names[lo:hi]
+
+    def match(self, glob: str, within: Container[str]) -> Optional[str]:
+        '''The last userhash in `within` starting with a match of `glob`
+
+        `*` matches any text, everything else matches itself
+        '''
+
+        prefix, _, rest = glob.partition('*')
+        candidates: [str] = self.prefixed(prefix)
+        if rest.strip('*'):
+            glob_re: re.Pattern = _glob_re(glob)
+            candidates = [k for k in candidates if glob_re.match(k)]
+        for k in reversed(candidates):
+            if k in within:
+                return k
+        return None
+
+    def userhash_of(self, user_id: str) -> Optional[str]:
+        '''The userhash remembered for `user_id`, `None` if none or stale'''
+
+        resolved: (str, float) = self._ids.get(user_id)
+        if resolved is None:
+            return None
+        userhash, when = resolved
+        if time.monotonic() - when > self.ttl:
+            del self._ids[user_id]
+            return None
+        return userhash
+
+    def remember(self, user_id: str, userhash: str) -> None:
+        self._ids[user_id] = (userhash, time.monotonic())
+
+
+@lru_cache(maxsize=256)
+def _glob_re(glob: str) -> re.Pattern:
+    return re.compile('.*'.join(map(re.escape, glob.split('*'))))
@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+from .node import Node
+from .tree import Tree
+import langg.proto.ttop_pb2 as ttop_pb2
+import langg.proto.ttop_v2_pb2 as ttop_v2_pb2
+from ..translate.router_vals import (RouterValuesGenerator, RouterValues)
+
+from array import array
+from itertools import accumulate
+from typing import (Callable, Sized)
+
+
+class CompactNode(Node):
+    '''Read-only :class:`langg.lib.node.Node` view of a :class:`CompactTree`
+
+    Views are created on demand and hold nothing but the tree and the index
+     of the node, so the recursive :class:`langg.lib.node.Node` methods
+     (exporters, stats) work unchanged against the flat arrays
+
+    Attributes:
+
+        tree: The :class:`CompactTree` holding the node data
+
+        idx: Index of this node in the arrays of `tree`
+    '''
+
+    def __init__(self, tree: CompactTree, idx: int):
+        self.tree: CompactTree = tree
+        self.idx: int = idx
+
+    @property
+    def char(self) -> str:
+        return chr(self.tree.chars[self.idx])
+
+    @property
+    def visits(self) -> int:
+        return self.tree.visits[self.idx]
+
+    @property
+    def depth(self) -> int:
+        return self.tree.depths[self.idx]
+
+    @property
+    def children(self) -> dict[str, Node]:
+        return {v.char: v for v in self.child_list}
+
+    @property
+    def child_list(self) -> (Node, ...):
+        first, n = self.tree.child_range(self.idx)
+        return tuple(CompactNode(self.tree, i)
+                     for i in range(first, first + n))
+
+    @property
+    def cum_visits(self) -> array:
+        first, n = self.tree.child_range(self.idx)
+        return self.tree.cum_visits[first:first + n]
+
+    def sort_tree(self):
+        pass
+
+    def index_children(self) -> None:
+        pass
+
+
+class CompactTree(Tree):
+    '''Array-backed alternative to :class:`langg.lib.tree.Tree`
+
+    Nodes are laid out breadth first in flat parallel arrays, the children of
+     a node are contiguous and kept in the order of the source tree; this
+     costs a few dozen bytes per node instead of a
+     :class:`langg.lib.node.Node` object, a `dict` and the selection tables
+
+    The tree is immutable, build a :class:`langg.lib.tree.Tree` and convert
+     it with :meth:`from_tree`
+
+    Attributes:
+
+        chars: Code point of the char of each node
+
+        visits: Visits of each node
+
+        depths: Depth of each node
+
+        first_child: Index of the first child of each node, `-1` for leaves
+
+        next_sibling: Index of the next sibling of each node, `-1` for the
+            last child
+
+        n_children: Number of children of each node
+
+        cum_visits: Running total of visits over each group of siblings, see
+            :meth:`langg.lib.node.Node.index_children`
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self.chars: array = array('I')
+        self.visits: array = array('q')
+        self.depths: array = array('I')
+        self.first_child: array = array('i')
+        self.next_sibling: array = array('i')
+        self.n_children: array = array('I')
+        self.cum_visits: array = array('q')
+        self._root_children: dict[int, int] = {}
+
+    @classmethod
+    def from_tree(cls, tree: Tree) -> CompactTree:
+        _self: CompactTree = CompactTree._with_meta(tree)
+        _self._fill(tree.root, lambda n: n.children.values())
+        _self.kmers = tree.kmers
+        return _self
+
+    @classmethod
+    def from_protobuf(cls, tree: ttop_pb2.TreeTop.Tree) -> CompactTree:
+        _self: CompactTree = CompactTree._with_meta(tree)
+        _self._fill(tree.root, lambda n: n.children)
+        return _self
+
+    @classmethod
+    def from_flat_protobuf(
+            cls, tree: ttop_v2_pb2.FlatTreeTop.Tree) -> CompactTree:
+        '''Load the node table of a flat protobuf tree as is'''
+
+        _self: CompactTree = CompactTree._with_meta(tree)
+        n_children: [int] = list(tree.n_children)
+        if not (len(tree.chars) == len(tree.visits) == len(tree.depths)
+                == len(n_children) == sum(n_children) + 1):
+            raise Exception(f'Malformed flat protobuf tree: {tree.name}')
+        _self._set_columns(
+            list(map(ord, tree.chars)), list(tree.visits),
+            list(tree.depths), n_children)
+        return _self
+
+    @classmethod
+    def _with_meta(cls, tree) -> CompactTree:
+        _self: CompactTree = CompactTree()
+        _self.name = tree.name
+        _self.considered_chars = list(tree.considered_chars)
+        _self.root_chars = list(tree.root_chars)
+        return _self
+
+    def _fill(self, root, children_of: Callable[[object], Sized]) -> None:
+        '''Lay out the nodes under `root` breadth first
+
+        `root` and its descendants only need `char`, `visits` and `depth`
+         attributes, which both :class:`langg.lib.node.Node` and the protobuf
+         node message provide
+        '''
+
+        order: list = [root]
+        n_children: [int] = []
+        # `order` grows as it is iterated, giving the breadth first layout
+        for node in order:
+            kids: Sized = children_of(node)
+            n_children.append(len(kids))
+            order.extend(kids)
+
+        self._set_columns(
+            [ord(node.char) for node in order],
+            [node.visits for node in order],
+            [node.depth for node in order],
+            n_children)
+
+    def _set_columns(self, chars: [int], visits: [int], depths: [int],
+                     n_children: [int]) -> None:
+        '''Fill the arrays from the breadth first columns of `_fill`
+
+        The first child of each node follows from `n_children` as children
+         are laid out in the order of their parents
+        '''
+
+        first_child: [int] = []
+        n_laid_out: int = 1
+        for n in n_children:
+            if n:
+                first_child.append(n_laid_out)
+                n_laid_out += n
+            else:
+                first_child.append(-1)
+
+        next_sibling: [int] = [-1] * len(chars)
+        cum_visits: [int] = visits.copy()
+        for first, n in zip(first_child, n_children):
+            if n > 1:
+                last: int = first + n
+                next_sibling[first:last - 1] = range(first + 1, last)
+                cum_visits[first:last] = accumulate(visits[first:last])
+
+        self.chars.fromlist(chars)
+        self.visits.fromlist(visits)
+        self.depths.fromlist(depths)
+        self.first_child.fromlist(first_child)
+        self.next_sibling.fromlist(next_sibling)
+        self.n_children.fromlist(n_children)
+        self.cum_visits.fromlist(cum_visits)
+
+        self.index_root()
+
+    def to_flat_protobuf(self, tree: ttop_v2_pb2.FlatTreeTop.Tree) -> None:
+        tree.name = self.name
+        tree.considered_chars.extend(self.considered_chars)
+        tree.root_chars.extend(self.root_chars)
+        tree.chars = ''.join(map(chr, self.chars))
+        tree.visits.extend(self.visits)
+        tree.depths.extend(self.depths)
+        tree.n_children.extend(self.n_children)
+
+    def to_tree(self) -> Tree:
+        '''Rebuild a :class:`langg.lib.tree.Tree`, keeping the child order'''
+
+        tree: Tree = Tree()
+        tree.name = self.name
+        tree.considered_chars = list(self.considered_chars)
+        tree.root_chars = list(self.root_chars)
+
+        nodes: [Node] = [Node(char=chr(c), level=d)
+                         for c, d in zip(self.chars, self.depths)]
+        for node, visits in zip(nodes, self.visits):
+            node.visits = visits
+        # The selection tables of a node sum the visits of its children
+        for i, node in enumerate(nodes):
+            first, n = self.child_range(i)
+            node.children = {v.char: v for v in nodes[first:first + n]}
+            node.index_children()
+        tree.root = nodes[0]
+        return tree
+
+    def index_root(self) -> None:
+        '''Map the char codes of the root's children to their indices'''
+
+        first, n = self.child_range(0)
+        self._root_children = {
+            self.chars[i]: i for i in range(first, first + n)}
+
+    @property
+    def root(self) -> CompactNode:
+        return CompactNode(self, 0)
+
+    @root.setter
+    def root(self, _) -> None:
+        # `Tree.__init__` assigns `None`, the root is always index 0
+        pass
+
+    def child_range(self, idx: int) -> (int, int):
+        '''First child index and number of children of node `idx`'''
+
+        return self.first_child[idx], self.n_children[idx]
+
+    def parse_infiles(self, full_words: bool = False, jobs: int = 1) -> None:
+        raise Exception('CompactTree is immutable, build a Tree instead')
+
+    def _adjust_words(self, words, full_words: bool, delta: int) -> int:
+        raise Exception('CompactTree is immutable, build a Tree instead')
+
+    def merge_into(self, node: Node) -> None:
+        '''See :meth:`langg.lib.node.Node.merge`, walks the arrays directly'''
+
+        targets: [Node] = [node] + [None] * (len(self.chars) - 1)
+        for i, target in enumerate(targets):
+            target.visits += self.visits[i]
+            first, n = self.child_range(i)
+            for j in range(first, first + n):
+                char: str = chr(self.chars[j])
+                child: Node = target.children.get(char)
+                if child is None:
+                    child = Node(char=char, level=target.depth + 1)
+                    target.children[char] = child
+                targets[j] = child
+
+    def node_count(self) -> int:
+        return len(self.chars)
+
+    def sort_tree(self):
+        pass
+
+    def build_word(self, rvg: RouterValuesGenerator,
+                   rv: RouterValues) -> str:
+        '''See :meth:`langg.lib.tree.Tree.build_word`'''
+
+        chars: array = self.chars
+        first_child: array = self.first_child
+        n_children: array = self.n_children
+        cum_visits: array = self.cum_visits
+        root_children: dict[int, int] = self._root_children
+
+        word: str = ''
+        depth: int = 0
+        node: int = 0
+        while len(word) < rv.word_length:
+            if depth < rv.max_depth:
+                node = root_children.get(chars[node], 0)
+            first: int = first_child[node]
+            idx: int = rvg.child_idx(
+                cum_visits[first:first + n_children[node]])
+            if idx == -1:
+                node = root_children.get(chars[node], 0)
+                continue
+            node = first + idx
+            depth += 1
+            word += chr(chars[node])
+        return word
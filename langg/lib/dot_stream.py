@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from .node import Node
+from .tree import Tree
+
+from typing import TextIO
+
+# Lines written to the file handle at a time
+WRITE_BATCH: int = 1 << 12
+
+
+def dump(trees: [Tree], f: TextIO, max_depth: int = None,
+         min_visits: int = 0) -> None:
+    '''Write a `strict digraph` per tree, separated by newlines'''
+
+    for i, tree in enumerate(trees):
+        if i:
+            f.write('\n')
+        dump_tree(tree, f, max_depth=max_depth, min_visits=min_visits)
+
+
+def dump_tree(tree: Tree, f: TextIO, max_depth: int = None,
+              min_visits: int = 0) -> None:
+    '''Write `tree` as a graph, node by node
+
+    Nodes are written depth first, each with the edges to its children, and
+     numbered from `0` in the order they are first named, so the output is
+     the same from run to run. Nodes deeper than `max_depth` or with fewer
+     than `min_visits` visits are left out, with their subtrees
+    '''
+
+    graph_name: str = tree.name.replace('.', '_').replace('-', '_')
+    lines: [str] = [f'strict digraph {graph_name} {{\n']
+    next_id: int = 1
+    # Nodes to write and their ids
+    stack: [(Node, int)] = [(tree.root, 0)]
+    while stack:
+        node, node_id = stack.pop()
+        indent: str = ' ' * (node.depth + 1)
+        lines.append(f'{indent}{node_id} [label="{_label(node)}"]\n')
+
+        children: [(Node, int)] = []
+        if max_depth is None or node.depth < max_depth:
+            for child in node.children.values():
+                if child.visits >= min_visits:
+                    children.append((child, next_id))
+                    lines.append(f'{indent}{node_id} -> {next_id}\n')
+                    next_id += 1
+        # Reversed so children are written in order
+        stack.extend(reversed(children))
+
+        if len(lines) > WRITE_BATCH:
+            f.write(''.join(lines))
+            lines.clear()
+    lines.append('}')
+    f.write(''.join(lines))
+
+
+def _label(node: Node) -> str:
+    char: str = node.char.replace('\\', '\\\\').replace('"', '\\"')
+    return f'{char} ({node.visits})'
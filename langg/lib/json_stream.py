@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+from .node import Node
+from .tree import Tree
+
+import re
+import json
+from json.encoder import encode_basestring_ascii
+from typing import (Any, Iterator, TextIO)
+
+CHUNK_SIZE: int = 1 << 16
+
+# Pieces of JSON text joined per write
+WRITE_BATCH: int = 1 << 12
+
+# JSON whitespace and the separators between tokens
+_SEPARATORS: str = ' \t\n\r,:'
+
+# Separators and one token; the last branch is numbers and literals. A
+#  string is either closed or runs to the end of the text, so the tokens
+#  found cover the text without gaps, bar trailing separators
+_TOKEN_RE: re.Pattern = re.compile(
+    r'[ \t\n\r,:]*([{}\[\]]|"(?:[^"\\]|\\.)*(?:"|\\?\Z)|[^ \t\n\r,:{}\[\]"]+)')
+
+_STRING_RE: re.Pattern = re.compile(r'"(?:[^"\\]|\\.)*"')
+
+_LITERALS: dict[str, Any] = {'true': True, 'false': False, 'null': None}
+
+_END: object = object()
+
+
+def dump(trees: [Tree], f: TextIO, indent: int = None) -> None:
+    '''Write `trees` as `json.dump` would write their `to_dict`
+
+    Nodes are written as they are walked, keeping an iterator per level
+     rather than building the nested dicts and the whole string, so memory
+     is bounded by the depth of the trees
+    '''
+
+    # Pieces are written to `f` in batches, few calls of `f.write` are
+    #  cheaper than one per piece
+    out: [str] = []
+    write = out.append
+    item_sep: str = ', ' if indent is None else ','
+
+    def newline(level: int) -> None:
+        if indent is not None:
+            write('\n' + ' ' * (indent * level))
+
+    # Open containers, each an iterator over its remaining items and whether
+    #  it is an object
+    stack: [(Iterator, bool)] = []
+    value: Any = trees
+    while True:
+        if len(out) > WRITE_BATCH:
+            f.write(''.join(out))
+            out.clear()
+
+        items: Iterator = _items(value)
+        if items is None:
+            write(_encode(value))
+        else:
+            is_map: bool = not isinstance(value, list)
+            item: Any = next(items, _END)
+            if item is _END:
+                write('{}' if is_map else '[]')
+            else:
+                write('{' if is_map else '[')
+                stack.append((items, is_map))
+                newline(len(stack))
+                value = _write_key(write, item, is_map)
+                continue
+
+        # The value is written, move on to the next item of its container
+        while stack:
+            items, is_map = stack[-1]
+            item = next(items, _END)
+            if item is not _END:
+                write(item_sep)
+                newline(len(stack))
+                value = _write_key(write, item, is_map)
+                break
+            stack.pop()
+            newline(len(stack))
+            write('}' if is_map else ']')
+        else:
+            f.write(''.join(out))
+            return
+
+
+def _items(value: Any) -> Iterator:
+    '''Items of a container, `None` for scalars
+
+    Objects are iterators over key/value pairs, in the key order of
+     `to_dict`
+    '''
+
+    if type(value) is int or type(value) is str:
+        return None
+    if isinstance(value, Node):
+        return iter((
+            ('char', value.char),
+            ('children', value.children),
+            ('visits', value.visits),
+            ('depth', value.depth)))
+    if isinstance(value, Tree):
+        return iter((
+            ('name', value.name),
+            ('root_chars', value.root_chars),
+            ('considered_chars', value.considered_chars),
+            ('root', value.root)))
+    if isinstance(value, dict):
+        return iter(value.items())
+    if isinstance(value, list):
+        return iter(value)
+    return None
+
+
+def _write_key(write, item: Any, is_map: bool) -> Any:
+    if not is_map:
+        return item
+    key, value = item
+    write(_encode(key))
+    write(': ')
+    return value
+
+
+def _encode(value: Any) -> str:
+    if type(value) is int:
+        return str(value)
+    if type(value) is str:
+        return encode_basestring_ascii(value)
+    return json.dumps(value)
+
+
+def events(f: TextIO, chunk_size: int = CHUNK_SIZE
+           ) -> Iterator[(str, Any)]:
+    '''Parse JSON from `f` a chunk at a time
+
+    Yields `(event, value)`, events are `start_map`, `end_map`,
+     `start_array`, `end_array`, `key` and `value`; the value is `None`
+     except for keys and values
+    '''
+
+    # Whether each open container is an object
+    stack: [bool] = []
+    key_next: bool = False
+    buf: str = ''
+    eof: bool = False
+    while not eof:
+        chunk: str = f.read(chunk_size)
+        eof = not chunk
+        text: str = buf + chunk
+        tokens: [str] = _TOKEN_RE.findall(text)
+        if not eof:
+            # The last token may go on in the next chunk, it is carried over
+            #  with the separators after it so it cannot run into the next
+            #  token. Only an unclosed string ends with the text
+            buf = tokens.pop() if tokens else ''
+            unclosed: bool = buf[:1] == '"' and not _STRING_RE.fullmatch(buf)
+            if buf and not unclosed:
+                end: int = len(text.rstrip(_SEPARATORS))
+                buf = text[end - len(buf):]
+        elif tokens and tokens[-1][0] == '"' \
+                and not _STRING_RE.fullmatch(tokens[-1]):
+            raise Exception('Truncated JSON string')
+        for tok in tokens:
+            c: str = tok[0]
+            if c == '"':
+                s: str = json.loads(tok) if '\\' in tok else tok[1:-1]
+                if key_next:
+                    key_next = False
+                    yield 'key', s
+                    continue
+                yield 'value', s
+            elif c == '{' or c == '[':
+                stack.append(c == '{')
+                key_next = c == '{'
+                yield ('start_map' if key_next else 'start_array'), None
+                continue
+            elif c == '}' or c == ']':
+                if not stack or stack.pop() != (c == '}'):
+                    raise Exception(f'Unbalanced JSON at: {tok}')
+                yield ('end_map' if c == '}' else 'end_array'), None
+            else:
+                yield 'value', _scalar(tok)
+            key_next = bool(stack) and stack[-1]
+
+    if stack:
+        raise Exception('Truncated or malformed JSON')
+
+
+def _scalar(tok: str) -> Any:
+    if tok in _LITERALS:
+        return _LITERALS[tok]
+    try:
+        return int(tok)
+    except ValueError:
+        return float(tok)
+
+
+def load(f: TextIO) -> [Tree]:
+    '''Build the trees of a file written by :func:`dump` as it is parsed
+
+    Each node object becomes a :class:`langg.lib.node.Node` as soon as it
+     closes, so only the objects still open, one per level, are ever held
+     as dicts
+    '''
+
+    # Open containers and the key awaiting a value in each
+    stack: [[Any, str]] = []
+    result: Any = None
+    for event, value in events(f):
+        if event == 'key':
+            stack[-1][1] = value
+            continue
+        if event == 'start_map':
+            stack.append([{}, None])
+            continue
+        if event == 'start_array':
+            stack.append([[], None])
+            continue
+        if event == 'end_map' or event == 'end_array':
+            value = _convert(stack.pop()[0])
+
+        if not stack:
+            result = value
+        elif stack[-1][1] is None:
+            stack[-1][0].append(value)
+        else:
+            stack[-1][0][stack[-1][1]] = value
+
+    if not isinstance(result, list):
+        raise Exception('Expected a JSON list of trees')
+    return result
+
+
+def _convert(obj: Any) -> Any:
+    '''Swap node and tree objects for :class:`Node`s and :class:`Tree`s'''
+
+    if not isinstance(obj, dict):
+        return obj
+    if 'visits' in obj and 'depth' in obj:
+        node: Node = Node(char=obj['char'], level=obj['depth'])
+        node.visits = obj['visits']
+        node.children = obj['children'] or {}
+        node.index_children()
+        return node
+    if 'root' in obj:
+        tree: Tree = Tree()
+        tree.name = obj['name']
+        tree.considered_chars = obj['considered_chars']
+        tree.root_chars = obj['root_chars']
+        tree.root = obj['root']
+        return tree
+    return obj
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from .node import Node
+
+import heapq
+from collections import Counter
+from operator import itemgetter
+from typing import (Iterable, Optional)
+
+
+class KmerIndex:
+    '''Counts of the substrings of up to `k` chars of a tree's words
+
+    Filled word by word as the words are inserted into the tree (see
+     :meth:`langg.lib.tree.Tree.index_kmers`), `counts[s]` is the visits of
+     the node at path `s`, so k-mer questions are dict lookups instead of
+     walks of the tree
+
+    Attributes:
+
+        k: Longest substring counted
+
+        counts: Occurrences of each substring of 1 to `k` chars, only at the
+            start of words for trees of full words
+
+        starts: Words starting with each k-mer
+
+        ends: Words ending with each k-mer
+
+    `starts` and `ends` are `None` when not known, see :meth:`from_tree`
+    '''
+
+    def __init__(self, k: int):
+        self.k: int = k
+        self.counts: Counter = Counter()
+        self.starts: Optional[Counter] = Counter()
+        self.ends: Optional[Counter] = Counter()
+
+    @classmethod
+    def from_tree(cls, root: Node, k: int) -> KmerIndex:
+        '''Rebuild the counts from the nodes down to depth `k`
+
+        Which words start or end with a k-mer is not kept in a tree
+        '''
+
+        _self: KmerIndex = KmerIndex(k)
+        stack: [(str, Node)] = [('', root)]
+        while stack:
+            path, node = stack.pop()
+            if len(path) < k:
+                for char, child in node.children.items():
+                    _self.counts[path + char] = child.visits
+                    stack.append((path + char, child))
+        _self.starts = _self.ends = None
+        return _self
+
+    def add_word(self, word: str, full_words: bool = False,
+                 delta: int = 1, starts: Iterable[int] = None) -> None:
+        '''Count `word` as the tree inserts it, a `delta` of `-1` uncounts it
+
+        `starts` limits the count to the suffixes of `word` at those
+         positions, as inserted or removed by the tree, by default all of
+         them (only the word itself with `full_words`)
+        '''
+
+        k: int = self.k
+        n: int = len(word)
+        if starts is None:
+            starts = range(1 if full_words else n)
+        substrings: [str] = [
+            word[start:end] for start in starts
+            for end in range(start + 1, min(start + k, n) + 1)]
+        if n < k or 0 not in starts:
+            edges: [(Counter, str)] = []
+        else:
+            edges = [(self.starts, word[:k]), (self.ends, word[-k:])]
+
+        if delta == 1:
+            self.counts.update(substrings)
+            for counter, kmer in edges:
+                if counter is not None:
+                    counter[kmer] += delta
+            return
+
+        # Dropping counts down to zero, as the tree prunes nodes left without
+        #  visits
+        for counter, kmer in [(self.counts, s) for s in substrings] + edges:
+            if counter is None:
+                continue
+            counter[kmer] += delta
+            if counter[kmer] <= 0:
+                del counter[kmer]
+
+    def merge(self, other: KmerIndex) -> None:
+        if other.k != self.k:
+            raise Exception(f'Cannot merge {other.k}-mers into {self.k}-mers')
+        self.counts.update(other.counts)
+        for name in ('starts', 'ends'):
+            mine: Optional[Counter] = getattr(self, name)
+            theirs: Optional[Counter] = getattr(other, name)
+            if mine is not None and theirs is not None:
+                mine.update(theirs)
+            else:
+                setattr(self, name, None)
+
+    def count(self, kmer: str) -> int:
+        return self.counts.get(kmer, 0)
+
+    def start_count(self, kmer: str) -> int:
+        return self.starts.get(kmer, 0)
+
+    def end_count(self, kmer: str) -> int:
+        return self.ends.get(kmer, 0)
+
+    def kmers(self) -> [str]:
+        '''The k-mers present, sorted as the children of a sorted tree'''
+
+        return sorted(s for s in self.counts if len(s) == self.k)
+
+    def top(self, n: int) -> [(str, int)]:
+        '''The `n` most frequent k-mers and their counts'''
+
+        return heapq.nlargest(
+            n, ((s, c) for s, c in self.counts.items() if len(s) == self.k),
+            key=itemgetter(1))
+
+    def path_counts(self, kmer: str) -> [(str, int)]:
+        '''Each char of `kmer` and the count of the substring ending at it,
+         as the `(char, visits)` of the nodes along its path'''
+
+        return [(c, self.counts[kmer[:i + 1]]) for i, c in enumerate(kmer)]
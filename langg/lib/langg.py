@@ -1,9 +1,16 @@
 from ..util import namespace_ext as ns_ext
 from ..lib.ttop import TreeTop
 from ..translate.translator import Translator
+from ..translate import batch
 
+import sys
 import json
+import logging
+from contextlib import nullcontext
 from types import SimpleNamespace
+from typing import (ContextManager, TextIO)
+
+LOG: logging.Logger = logging.getLogger('langg')
 
 
 # Todo: Shouldn't be printing if this is going to be an API...
@@ -11,44 +18,102 @@ def treegen(ttop: TreeTop, args: SimpleNamespace) -> None:
     op_data: SimpleNamespace = args.op_data
 
     if op_data.json_out:
-        print(ttop.to_json())
+        ttop.dump_json(sys.stdout, indent=2)
+        print()
 
     if op_data.json_outfile:
         ttop.write_json(op_data.json_outfile)
 
+    dot_pruning: dict = {
+        'max_depth': op_data.dot_max_depth,
+        'min_visits': op_data.dot_min_visits,
+    }
+
     if op_data.dot_out:
-        print(ttop.to_dot())
+        ttop.dump_dot(sys.stdout, **dot_pruning)
+        print()
 
     if op_data.dot_outfile:
-        ttop.write_dot(op_data.dot_outfile)
+        ttop.write_dot(op_data.dot_outfile, **dot_pruning)
 
     if op_data.proto_outfile:
         ttop.write_protobuf(op_data.proto_outfile)
 
+    if op_data.mmap_outfile:
+        ttop.write_mmap(op_data.mmap_outfile)
+
     if op_data.stats:
-        print(json.dumps(ttop.longest_branches(), indent=2))
-        print(json.dumps(ttop.statistics(), indent=2))
+        stats: dict = ttop.statistics(op_data.kmers, extra=op_data.extra_stats)
+        print(json.dumps({
+            name: tree_stats['longest_branch']
+            for name, tree_stats in stats.items()}, indent=2))
+        print(json.dumps(stats, indent=2))
 
 
 def translate(ttop: TreeTop, args: SimpleNamespace) -> None:
+    op_data: SimpleNamespace = args.op_data
+
+    if op_data.txt_in:
+        with _txt_out(op_data.txt_outfile) as out:
+            n: int = batch.translate_files(
+                ttop, args, op_data.txt_in, out, op_data.jobs, args.mmap_in)
+        LOG.info(f'Translated {n} lines of {op_data.txt_in}')
+        return
+
     translator: Translator = Translator.from_cli(ttop, args)
 
-    if args.op_data.stdin:
-        translator.translate_stdin()
-    else:
-        txt: str = translator.translate_cli_input()
-        print(txt)
+    with _txt_out(op_data.txt_outfile) as out:
+        if op_data.stdin:
+            translator.translate_stdin(out, op_data.flush_lines)
+        else:
+            out.write(translator.translate_cli_input() + '\n')
+
+    LOG.info(f'Translation cache: {translator.cache.info()}')
+
+
+def _txt_out(fn: str) -> ContextManager[TextIO]:
+    '''The file translations are written to, stdout without `fn`'''
+
+    return open(fn, 'w') if fn else nullcontext(sys.stdout)
+
+
+def update(ttop: TreeTop, args: SimpleNamespace) -> None:
+    op_data: SimpleNamespace = args.op_data
+
+    # Removed first so that a word in both files is kept
+    for tree in ttop.trees:
+        for fn in op_data.remove_infiles or []:
+            n: int = tree.remove_words(tree.read_words(fn), op_data.full)
+            LOG.info(f'Removed {n} words of {fn} from {tree.name}')
+        for fn in op_data.add_infiles or []:
+            n: int = tree.add_words(tree.read_words(fn), op_data.full)
+            LOG.info(f'Added {n} words of {fn} to {tree.name}')
+
+    if op_data.json_outfile:
+        ttop.write_json(op_data.json_outfile)
+
+    if op_data.proto_outfile:
+        ttop.write_protobuf(op_data.proto_outfile)
+
+    if op_data.mmap_outfile:
+        ttop.write_mmap(op_data.mmap_outfile)
 
 
 def run(args_dict: dict) -> None:
     args: SimpleNamespace = ns_ext.wrap_namespace(args_dict)
 
-    if args.infiles:
+    if args.infiles and args.cmd in ('update', 'upd'):
+        raise Exception('Update needs a built tree, see --proto-in')
+    elif args.infiles:
         ttop = TreeTop.from_cli(args)
-        ttop.parse_infiles()
+        if getattr(args.op_data, 'stats', False):
+            ttop.index_kmers(args.op_data.kmers)
+        ttop.parse_infiles(args.op_data.jobs)
         ttop.sort_trees()
     elif args.proto_in:
-        ttop = TreeTop.from_protobuf(args.proto_in)
+        ttop = TreeTop.from_protobuf(args.proto_in, compact=args.compact)
+    elif args.mmap_in:
+        ttop = TreeTop.from_mmap(args.mmap_in)
     elif args.json_in:
         ttop = TreeTop.from_json(args.json_in)
     else:
@@ -57,9 +122,15 @@ def run(args_dict: dict) -> None:
     if not ttop:
         raise Exception('No TreeTop was generated')
 
-    if args.cmd in ('generate', 'gen', 'treegen'):
-        treegen(ttop, args)
-    elif args.cmd in ('translate', 'trn', 'langg'):
-        translate(ttop, args)
-    else:
-        raise Exception(f'Unknown subcommand: {args.cmd}')
+    if args.compact:
+        ttop.compact()
+
+    with ttop:
+        if args.cmd in ('generate', 'gen', 'treegen'):
+            treegen(ttop, args)
+        elif args.cmd in ('translate', 'trn', 'langg'):
+            translate(ttop, args)
+        elif args.cmd in ('update', 'upd'):
+            update(ttop, args)
+        else:
+            raise Exception(f'Unknown subcommand: {args.cmd}')
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+from .tree import Tree
+from .compact_tree import CompactTree
+
+import sys
+import mmap
+import struct
+from array import array
+from typing import BinaryIO
+
+MAGIC: bytes = b'LANGGMM\x00'
+VERSION: int = 1
+
+ALIGN: int = 8
+
+# Header: magic, version, number of trees
+HEADER: struct.Struct = struct.Struct('<8sII')
+U32: struct.Struct = struct.Struct('<I')
+U64: struct.Struct = struct.Struct('<Q')
+
+# Node table columns in file order, all 4-byte columns first so that the
+#  8-byte ones stay aligned
+COLUMNS: [(str, str)] = [
+    ('chars', 'I'),
+    ('depths', 'I'),
+    ('first_child', 'i'),
+    ('next_sibling', 'i'),
+    ('n_children', 'I'),
+    ('visits', 'q'),
+    ('cum_visits', 'q'),
+]
+
+LITTLE_ENDIAN: bool = sys.byteorder == 'little'
+
+
+class MmapTree(CompactTree):
+    '''A :class:`langg.lib.compact_tree.CompactTree` read in place from a file
+
+    The node table columns are `memoryview`s over a read-only `mmap` of the
+     file written by :func:`write`, so loading costs only the header and
+     pages are read as the translation touches them. The trees of a file
+     share its `mmap`, which is unmapped by :meth:`close` once every one of
+     them is closed
+
+    Attributes:
+
+        buf: The `mmap` backing the columns, `None` once closed
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self.buf = None
+        # Views of `buf` held by this tree, released on close
+        self._views: [memoryview] = []
+
+    def __enter__(self) -> MmapTree:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        '''Release the columns, the tree cannot be used afterwards'''
+
+        if self.buf is None:
+            return
+        for name, typecode in COLUMNS:
+            setattr(self, name, array(typecode))
+        self.children = {}
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        buf, self.buf = self.buf, None
+        try:
+            buf.close()
+        except BufferError:
+            # Other trees of the file still view it, the last one closes it
+            pass
+
+
+def write(f: BinaryIO, trees: [Tree]) -> None:
+    '''Write `trees` as a flat, little-endian node table per tree
+
+    Layout: the header, then per tree the name, considered chars and root
+     chars (u32 count, each a u32 length and UTF-8 bytes), the u64 node count
+     and the :data:`COLUMNS`, each padded to :data:`ALIGN` bytes
+    '''
+
+    f.write(HEADER.pack(MAGIC, VERSION, len(trees)))
+    for tree in trees:
+        if not isinstance(tree, CompactTree):
+            tree = CompactTree.from_tree(tree)
+        _write_strs(f, [tree.name])
+        _write_strs(f, tree.considered_chars)
+        _write_strs(f, tree.root_chars)
+        f.write(U64.pack(tree.node_count()))
+        for name, typecode in COLUMNS:
+            _pad(f)
+            column = getattr(tree, name)
+            if not LITTLE_ENDIAN:
+                column = array(typecode, column)
+                column.byteswap()
+            f.write(column)
+        _pad(f)
+
+
+def read(fn: str) -> [MmapTree]:
+    '''Map the file written by :func:`write` and view its trees in place
+
+    The trees own the `mmap`, see :meth:`MmapTree.close`
+    '''
+
+    with open(fn, 'rb') as f:
+        header: bytes = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise Exception(f'Not a langg mmap file, too short: {fn}')
+        magic, version, n_trees = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise Exception(f'Not a langg mmap file: {fn}')
+        if version != VERSION:
+            raise Exception(f'Unsupported langg mmap version {version}: {fn}')
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    trees: [MmapTree] = []
+    view: memoryview = memoryview(buf)
+    try:
+        off: int = HEADER.size
+        for _ in range(n_trees):
+            tree: MmapTree = MmapTree()
+            tree.buf = buf
+            trees.append(tree)
+            (tree.name,), off = _read_strs(view, off)
+            tree.considered_chars, off = _read_strs(view, off)
+            tree.root_chars, off = _read_strs(view, off)
+            n_nodes: int = U64.unpack_from(view, off)[0]
+            off += U64.size
+            for name, typecode in COLUMNS:
+                off = _aligned(off)
+                size: int = n_nodes * array(typecode).itemsize
+                if off + size > len(view):
+                    raise struct.error('column past the end of the file')
+                setattr(tree, name,
+                        _column(tree, view[off:off + size], typecode))
+                off += size
+            off = _aligned(off)
+            tree.index_root()
+    except (struct.error, ValueError) as e:
+        for tree in trees:
+            tree.close()
+        view.release()
+        buf.close()
+        raise Exception(f'Truncated or corrupt langg mmap file: {fn}: {e}')
+    view.release()
+    return trees
+
+
+def _column(tree: MmapTree, view: memoryview, typecode: str):
+    tree._views.append(view)
+    if LITTLE_ENDIAN:
+        column: memoryview = view.cast(typecode)
+        tree._views.append(column)
+        return column
+    # Big-endian hosts pay for a copy
+    column: array = array(typecode, view.tobytes())
+    column.byteswap()
+    return column
+
+
+def _write_strs(f: BinaryIO, strs: [str]) -> None:
+    f.write(U32.pack(len(strs)))
+    for s in strs:
+        b: bytes = s.encode('utf-8')
+        f.write(U32.pack(len(b)))
+        f.write(b)
+
+
+def _read_strs(view: memoryview, off: int) -> ([str], int):
+    n: int = U32.unpack_from(view, off)[0]
+    off += U32.size
+    strs: [str] = []
+    for _ in range(n):
+        size: int = U32.unpack_from(view, off)[0]
+        off += U32.size
+        strs.append(bytes(view[off:off + size]).decode('utf-8'))
+        off += size
+    return strs, off
+
+
+def _aligned(off: int) -> int:
+    return off + (-off % ALIGN)
+
+
+def _pad(f: BinaryIO) -> None:
+    f.write(b'\x00' * (-f.tell() % ALIGN))
@@ -3,7 +3,7 @@ from __future__ import annotations
 import langg.proto.ttop_pb2 as ttop_pb2
 
 import json
-from copy import deepcopy
+from itertools import accumulate
 
 
 class Node:
@@ -13,6 +13,9 @@ class Node:
         self.children: dict[str, Node] = {}
         self.visits: int = 0
         self.depth: int = level
+        # Selection tables, populated by `index_children`
+        self.child_list: (Node, ...) = ()
+        self.cum_visits: (int, ...) = ()
 
     @classmethod
     def from_protobuf(cls, node: ttop_pb2.TreeTop.Tree.Node) -> Node:
@@ -22,6 +25,7 @@ class Node:
         _self.visits = node.visits
         for e in node.children:
             _self.children[e.char] = Node.from_protobuf(e)
+        _self.index_children()
         return _self
 
     @classmethod
@@ -33,28 +37,132 @@ class Node:
         if node['children']:
             for k, v in node['children'].items():
                 _self.children[k] = Node.from_json(v)
+        _self.index_children()
         return _self
 
     def __str__(self):
         return json.dumps(self.to_dict())
 
-    def _id(self):
-        return str(id(self))
+    def parse_word(self, word: str, start: int = 0) -> None:
+        '''Add `word[start:]` below this node, one visit per node passed'''
 
-    def parse_word(self, word: str) -> None:
         self.visits += 1
-        if not len(word):
-            return
-        char, word = word[0], word[1:]
-        if char not in self.children:
-            self.children[char] = Node(
-                char=char, level=self.depth + 1)
-        self.children[char].parse_word(word)
+        self._walk(word, start)
+
+    def insert_all_suffixes(self, word: str) -> None:
+        '''Add every suffix of `word` below this node'''
+
+        self.visits += len(word)
+        for i in range(len(word)):
+            self._walk(word, i)
+
+    def _walk(self, word: str, start: int) -> None:
+        '''Visit (creating where needed) the path for `word[start:]`
+
+        Iterates with an index into `word` rather than recursing on slices
+        '''
+
+        node: Node = self
+        for i in range(start, len(word)):
+            char: str = word[i]
+            child: Node = node.children.get(char)
+            if child is None:
+                child = Node(char=char, level=node.depth + 1)
+                node.children[char] = child
+            child.visits += 1
+            node = child
+
+    def adjust_path(self, word: str, start: int, delta: int,
+                    touched: dict[int, Node]) -> bool:
+        '''Add `delta` visits to the path for `word[start:]` below this node
+
+        Nodes are created when adding; when removing, a path not in the tree
+         is left alone and nodes down to zero visits are pruned with their
+         subtree (a child never has more visits than its parent). The visits
+         of this node itself are left to the caller
+
+        Nodes whose children changed are recorded in `touched`, by id, for
+         :meth:`reindex`
+
+        Returns: Whether the path was adjusted
+        '''
+
+        path: [Node] = [self]
+        node: Node = self
+        for i in range(start, len(word)):
+            child: Node = node.children.get(word[i])
+            if child is None:
+                if delta < 0:
+                    return False
+                child = Node(char=word[i], level=node.depth + 1)
+                node.children[child.char] = child
+            path.append(child)
+            node = child
+
+        for parent, child in zip(path, path[1:]):
+            touched[id(parent)] = parent
+            child.visits += delta
+            if child.visits <= 0:
+                del parent.children[child.char]
+                break
+        return True
+
+    def has_path(self, word: str, start: int = 0) -> bool:
+        '''Whether the path for `word[start:]` is below this node'''
+
+        node: Node = self
+        for i in range(start, len(word)):
+            node = node.children.get(word[i])
+            if node is None:
+                return False
+        return True
+
+    def reindex(self) -> None:
+        '''Re-sort and re-index the children of this node only, see
+         :meth:`sort_tree`'''
+
+        self.children = dict(sorted(self.children.items()))
+        self.index_children()
+
+    def merge(self, other: Node) -> None:
+        '''Sum the visits of `other`, the same position in another tree
+
+        Nodes missing from this tree are created, `other` is left untouched
+         and may be any node-like object (e.g. a
+         :class:`langg.lib.compact_tree.CompactNode`)
+        '''
+
+        stack: [(Node, Node)] = [(self, other)]
+        while stack:
+            node, other_node = stack.pop()
+            node.visits += other_node.visits
+            for other_child in other_node.children.values():
+                child: Node = node.children.get(other_child.char)
+                if child is None:
+                    child = Node(char=other_child.char, level=node.depth + 1)
+                    node.children[child.char] = child
+                stack.append((child, other_child))
 
     def sort_tree(self):
         self.children = dict(sorted(self.children.items()))
         for v in self.children.values():
             v.sort_tree()
+        self.index_children()
+
+    def index_children(self) -> None:
+        '''Build the tables used for weighted child selection
+
+        `cum_visits[i]` is the sum of the visits of the first `i + 1`
+         children, so a draw in `[0, cum_visits[-1])` maps to a child with a
+         binary search
+        '''
+
+        if not self.children:
+            self.child_list, self.cum_visits = (), ()
+            return
+        self.child_list = tuple(self.children.values())
+        self.cum_visits = tuple(accumulate(
+            v.visits for v in self.child_list))
 
     def to_protobuf(self, node: ttop_pb2.TreeTop.Tree.Node) -> None:
         node.char = self.char
@@ -63,58 +171,21 @@ class Node:
         for k, v in self.children.items():
             v.to_protobuf(node.children.add())
 
-    # Should pretty much be the longest word...
-    def longest_branch(self, chars: [(str, int)] = []) -> [(str, int)]:
-        if (self.char != ' '):
-            chars.append((self.char, self.visits))
-
-        if len(self.children) == 0:
-            return chars
-
-        branches: [[(str, int)]] = [v.longest_branch(deepcopy(chars))
-                                    for v in self.children.values()]
-
-        return max(branches, key=len)
-
     def node_count(self) -> int:
-        return sum([v.node_count() for v in self.children.values()]) + 1
-
-    def k_length_prefixes(
-            self, k: int, out: [], chars: [(str, int)] = []
-    ) -> [[[(str, int)]]]:
-
-        if (self.char != ' '):
-            chars.append((self.char, self.visits))
-
-        if self.depth == k:
-            out.append(chars)
-            return
-
-        for v in self.children.values():
-            v.k_length_prefixes(k, out, deepcopy(chars))
-
-    def k_length_suffixes(self):
-        pass
-
-    def to_dot(self):
-        indent: str = ' ' * (self.depth + 1)
-        id: str = self._id()
-
-        s: str = ''
-        s += f'{indent}{id} [label="{self.char} ({self.visits})"]\n'
-
-        for v in self.children.values():
-            s += f'{indent}{id} -> {v._id()}\n'
-
-        for v in self.children.values():
-            s += v.to_dot()
-
-        return s
+        count: int = 0
+        stack: [Node] = [self]
+        while stack:
+            node: Node = stack.pop()
+            count += 1
+            stack.extend(node.children.values())
+        return count
 
     def to_dict(self):
         return {
-            **self.__dict__,
+            'char': self.char,
             'children': {k: v.to_dict() for k, v in self.children.items()},
+            'visits': self.visits,
+            'depth': self.depth,
         }
 
 
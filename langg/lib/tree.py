@@ -1,13 +1,20 @@
 from __future__ import annotations
 
 from .node import Node
+from .word_reader import WordReader
+from .tree_stats import TreeStats
+from .kmer_index import KmerIndex
 from ..util import consts
+from ..util import gc_pause
 import langg.proto.ttop_pb2 as ttop_pb2
 from ..translate.router_vals import (RouterValuesGenerator, RouterValues)
 
 
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import (chain, islice)
 from types import SimpleNamespace
+from typing import (Iterable, Iterator, Optional)
 
 
 class Tree:
@@ -23,6 +30,9 @@ class Tree:
             root node
 
         root: Root node (see :class:`langg.lib.node.Node`) of the tree
+
+        kmers: Counts of the k-mers of the words inserted, kept up to date
+            with the tree once enabled by :meth:`index_kmers`
     '''
 
     def __init__(self):
@@ -30,6 +40,7 @@ class Tree:
         self.considered_chars: [str] = []
         self.root_chars: [str] = []
         self.root = None
+        self.kmers: Optional[KmerIndex] = None
 
     @classmethod
     def for_bot(cls, fn: str) -> Tree:
@@ -84,71 +95,165 @@ class Tree:
         tree.root_chars.extend(self.root_chars)
         self.root.to_protobuf(tree.root)
 
-    def parse_infiles(self, full_words: bool = False) -> None:
-        for infile in self.data:
-            self.data[infile] = self._read_words(infile)
-            for word in self.data[infile]:
-                if word[0] not in self.root_chars:
-                    continue
-                if full_words:
-                    self.root.parse_word(word)
-                else:
-                    for i in range(len(word)):
-                        self.root.parse_word(word[i:])
-
-    def _considered(self, c: str):
-        return c in self.considered_chars or c in consts.WHITESPACE_CHARS
-
-    def _read_words(self, infile) -> [str]:
-        with open(infile, 'r') as f:
-            contents = f.read()
-        warr: [str] = []
-        for i, c in enumerate(contents.lower()):
-            if not self._considered(c):
-                # Replace non-considered char with spaces, ignoring them will
-                #  cause quoted words to join
-                c = ' '
-            elif c == '\'':
-                # Want to keep if an apostrophe, but not if a quote
-                if i > 0 and contents[i - 1] == ' ':
+    def parse_infiles(self, full_words: bool = False, jobs: int = 1) -> None:
+        '''Add the words of the infiles to the tree
+
+        With more than one job the word stream is dealt round-robin to a
+         process pool, each process builds a partial tree over its shard and
+         the partial trees are merged into this one
+        '''
+
+        if jobs > 1:
+            self._parse_infiles_parallel(full_words, jobs)
+            return
+        with gc_pause.paused():
+            self._parse_infiles(full_words)
+
+    def _parse_infiles(self, full_words: bool,
+                       shard: int = 0, n_shards: int = 1) -> None:
+        reader: WordReader = WordReader(self.considered_chars)
+        words: Iterator[str] = chain.from_iterable(
+            reader.words(infile) for infile in self.data)
+        kmers: Optional[KmerIndex] = self.kmers
+        for word in islice(words, shard, None, n_shards):
+            if word[0] not in self.root_chars:
+                continue
+            if full_words:
+                self.root.parse_word(word)
+            else:
+                self.root.insert_all_suffixes(word)
+            if kmers is not None:
+                kmers.add_word(word, full_words)
+
+    def _parse_infiles_parallel(self, full_words: bool, jobs: int) -> None:
+        k: int = self.kmers.k if self.kmers is not None else 0
+        shard_args: [tuple] = [
+            (self.name, list(self.data), self.considered_chars,
+             self.root_chars, full_words, k, shard, jobs)
+            for shard in range(jobs)]
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            partials: Iterator[Tree] = pool.map(
+                _build_shard, *zip(*shard_args))
+            with gc_pause.paused():
+                for partial in partials:
+                    self.merge(partial)
+
+    def merge(self, other: Tree) -> None:
+        '''Sum the visits of `other` into this tree, see
+         :meth:`langg.lib.node.Node.merge`'''
+
+        if other.considered_chars != self.considered_chars:
+            raise Exception(
+                f'Cannot merge tree {other.name} into {self.name}, ' +
+                'considered chars differ')
+        other.merge_into(self.root)
+        if self.kmers is not None:
+            if other.kmers is None:
+                self.kmers = None
+            else:
+                self.kmers.merge(other.kmers)
+
+    def merge_into(self, node: Node) -> None:
+        '''Sum the visits of this tree into the tree under `node`'''
+
+        node.merge(self.root)
+
+    def add_words(self, words: Iterable[str],
+                  full_words: bool = False) -> int:
+        '''Add `words` to a built (and sorted) tree
+
+        Only the paths of the words are visited and only the nodes along
+         them re-sorted and re-indexed, so small edits to a large tree are
+         cheap. `words` should be cleaned as by :meth:`read_words` and
+         `full_words` match how the tree was built
+
+        Returns: The number of words added
+        '''
+
+        return self._adjust_words(words, full_words, 1)
+
+    def remove_words(self, words: Iterable[str],
+                     full_words: bool = False) -> int:
+        '''Undo :meth:`add_words` or :meth:`parse_infiles` for `words`
+
+        Words with any of their paths (each suffix unless `full_words`)
+         missing from the tree are skipped, leaving the tree as it was, and
+         nodes left without visits are pruned
+
+        Returns: The number of words removed
+        '''
+
+        return self._adjust_words(words, full_words, -1)
+
+    def _adjust_words(self, words: Iterable[str], full_words: bool,
+                      delta: int) -> int:
+        touched: dict[int, Node] = {}
+        n: int = 0
+        with gc_pause.paused():
+            for word in words:
+                if not word or word[0] not in self.root_chars:
                     continue
-                if i < len(contents) and contents[i + 1] == ' ':
+                paths: range = range(1 if full_words else len(word))
+                # A word is removed whole or not at all, a word never added
+                #  may still share some of its suffixes with the tree
+                if delta < 0 and not all(
+                        self.root.has_path(word, start) for start in paths):
                     continue
-            warr.append(c)
-        return ''.join(warr).split()
+                starts: [int] = [
+                    start for start in paths
+                    if self.root.adjust_path(word, start, delta, touched)]
+                if starts:
+                    self.root.visits += delta * len(starts)
+                    n += 1
+                    if self.kmers is not None:
+                        self.kmers.add_word(word, full_words, delta, starts)
+            for node in touched.values():
+                node.reindex()
+        return n
+
+    def read_words(self, infile) -> Iterator[str]:
+        '''Words of `infile` cleaned as when building the tree'''
+
+        return WordReader(self.considered_chars).words(infile)
 
     def node_count(self) -> int:
         return self.root.node_count()
 
+    def close(self) -> None:
+        '''Release what backs the tree, nothing for a tree of nodes, see
+         :meth:`langg.lib.mmap_tree.MmapTree.close`'''
+
+    def index_kmers(self, k: int) -> None:
+        '''Count the k-mers of the words inserted from now on, see
+         :attr:`kmers`'''
+
+        self.kmers = KmerIndex(k)
+
+    def kmer_index(self, k: int) -> KmerIndex:
+        ''':attr:`kmers` if counting `k`-mers, else rebuilt from the nodes
+         down to depth `k`'''
+
+        if self.kmers is not None and self.kmers.k == k:
+            return self.kmers
+        return KmerIndex.from_tree(self.root, k)
+
     def longest_branch(self) -> dict:
-        longest: [(str, int)] = self.root.longest_branch()
-        return {
-            'string': ''.join(t[0] for t in longest),
-            'visits': [{t[0]: t[1]} for t in longest],
-            'length': len(longest),
-        }
+        return TreeStats(self.root).longest_branch()
 
     def k_length_prefixes(self, k: int) -> dict:
-        out: [] = []
-        self.root.k_length_prefixes(k=k, out=out)
-        return {
-            'k': k,
-            'list': [
-                ''.join([tt[0] for tt in t]) for t in out
-            ],
-            'prefixes': [{
-                'string': ''.join([tt[0] for tt in t]),
-                'count': [tt[1] for tt in t][-1],
-                'visits': [{tt[0]: tt[1]} for tt in t]
-            } for t in out]
-        }
+        return TreeStats(self.root, self.kmer_index(k)).k_length_prefixes()
 
-    def sort_tree(self):
-        self.root.sort_tree()
+    def k_length_suffixes(self, k: int) -> dict:
+        return TreeStats(self.root, self.kmer_index(k)).k_length_suffixes()
+
+    def statistics(self, k: int, extra: bool = False) -> dict:
+        '''See :class:`langg.lib.tree_stats.TreeStats`, one walk for all'''
 
-    def to_dot(self) -> str:
-        graph_name: str = self.name.replace('.', '_').replace('-', '_')
-        return f'strict digraph {graph_name} {{\n{self.root.to_dot()}}}'
+        return TreeStats(self.root, self.kmer_index(k)).to_dict(extra=extra)
+
+    def sort_tree(self):
+        with gc_pause.paused():
+            self.root.sort_tree()
 
     def to_dict(self) -> dict:
         return {
@@ -162,23 +267,42 @@ class Tree:
                    rv: RouterValues) -> str:
         word: str = ''
         depth: int = 0
-        node = self.root
+        root: Node = self.root
+        node: Node = root
         while len(word) < rv.word_length:
             if depth < rv.max_depth:
-                if node.char in self.root.children:
-                    node = self.root.children[node.char]
-                else:
-                    node = self.root
-            idx: int = rvg.child_idx(
-                [v.visits for v in node.children.values()])
-            # print(f'N children ({len(node.children)})')
+                node = root.children.get(node.char, root)
+            idx: int = rvg.child_idx(node.cum_visits)
             if idx == -1:
-                if node.char in self.root.children:
-                    node = self.root.children[node.char]
-                else:
-                    node = self.root
+                node = root.children.get(node.char, root)
                 continue
-            node: Node = node.children[list(node.children.keys())[idx]]
+            node = node.child_list[idx]
             depth += 1
             word += node.char
         return word
+
+
+def _build_shard(name: str, infiles: [str], considered_chars: [str],
+                 root_chars: [str], full_words: bool, k: int,
+                 shard: int, n_shards: int) -> Tree:
+    '''Pool worker building the partial tree over one shard of the words
+
+    Returns a :class:`langg.lib.compact_tree.CompactTree`, which pickles back
+     to the parent far faster than a tree of nodes
+    '''
+
+    from .compact_tree import CompactTree
+
+    tree: Tree = Tree()
+    tree.name = name
+    tree.data = {fn: [] for fn in infiles}
+    tree.root = Node()
+    tree.considered_chars = considered_chars
+    tree.root_chars = root_chars
+    if k:
+        tree.index_kmers(k)
+    with gc_pause.paused():
+        tree._parse_infiles(full_words, shard, n_shards)
+        compact: CompactTree = CompactTree.from_tree(tree)
+    compact.kmers = tree.kmers
+    return compact
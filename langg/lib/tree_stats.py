@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from .node import Node
+from .kmer_index import KmerIndex
+
+from collections import Counter
+
+# Chars of nodes left out of paths, the root's
+ROOT_CHAR: str = ' '
+
+# Most frequent k-mers in the extra stats
+TOP_KMERS: int = 10
+
+
+class TreeStats:
+    '''Statistics of a tree gathered in one walk
+
+    The walk is iterative and keeps the chars of the current path in one
+     shared buffer, paths are only copied when reported, so it neither
+     recurses with the depth of the tree nor copies a path per node. Works
+     on anything with the :class:`langg.lib.node.Node` interface; k-mer
+     stats come from a :class:`langg.lib.kmer_index.KmerIndex`
+
+    Attributes:
+
+        kmers: Index of the k-mers of the tree, if reporting them
+
+        node_count: Number of nodes, the root included
+
+        longest: `(char, visits)` path to the first deepest leaf
+
+        fan_out: Per depth, the number of nodes with each number of
+            children
+
+        visits: Number of nodes per visit bucket, each a power of two
+            and counting the nodes from it to the next
+    '''
+
+    def __init__(self, root: Node, kmers: KmerIndex = None):
+        self.kmers: KmerIndex = kmers
+        self.node_count: int = 0
+        self.longest: [(str, int)] = []
+        self.fan_out: [Counter] = []
+        self.visits: Counter = Counter()
+        self._walk(root)
+
+    def _walk(self, root: Node) -> None:
+        fan_out: [Counter] = self.fan_out
+        visits: Counter = self.visits
+        path: [(str, int)] = []
+        # Nodes to visit and the length of the path above each
+        stack: [(Node, int)] = [(root, 0)]
+        while stack:
+            node, n_above = stack.pop()
+            self.node_count += 1
+            del path[n_above:]
+            if node.char != ROOT_CHAR:
+                path.append((node.char, node.visits))
+
+            children: dict[str, Node] = node.children
+            depth: int = node.depth
+            while len(fan_out) <= depth:
+                fan_out.append(Counter())
+            fan_out[depth][len(children)] += 1
+            visits[1 << (node.visits.bit_length() - 1)
+                   if node.visits > 0 else 0] += 1
+
+            if not children and len(path) > len(self.longest):
+                self.longest = path.copy()
+            # Reversed so children are visited in order
+            n: int = len(path)
+            stack.extend((v, n) for v in reversed(children.values()))
+
+    def longest_branch(self) -> dict:
+        return {
+            'string': ''.join(c for c, _ in self.longest),
+            'visits': [{c: v} for c, v in self.longest],
+            'length': len(self.longest),
+        }
+
+    def k_length_prefixes(self) -> dict:
+        kmers: [str] = self.kmers.kmers()
+        return {
+            'k': self.kmers.k,
+            'list': kmers,
+            'prefixes': [{
+                'string': s,
+                'count': self.kmers.count(s),
+                'visits': [{c: v} for c, v in self.kmers.path_counts(s)]
+            } for s in kmers]
+        }
+
+    def k_length_suffixes(self) -> dict:
+        '''Words ending with each k-mer, see
+         :attr:`langg.lib.kmer_index.KmerIndex.ends`'''
+
+        if self.kmers.ends is None:
+            raise Exception('Word ends are only counted while building a tree')
+        return {
+            'k': self.kmers.k,
+            'suffixes': [
+                {'string': s, 'count': c}
+                for s, c in sorted(self.kmers.ends.items())]
+        }
+
+    def top_kmers(self, n: int = TOP_KMERS) -> [dict]:
+        return [{'string': s, 'count': c} for s, c in self.kmers.top(n)]
+
+    def fan_out_by_depth(self) -> [dict]:
+        '''Per depth: nodes, leaves, mean and max number of children'''
+
+        out: [dict] = []
+        for depth, counts in enumerate(self.fan_out):
+            n_nodes: int = sum(counts.values())
+            if not n_nodes:
+                continue
+            out.append({
+                'depth': depth,
+                'nodes': n_nodes,
+                'leaves': counts[0],
+                'mean_fan_out': round(
+                    sum(n * c for n, c in counts.items()) / n_nodes, 3),
+                'max_fan_out': max(counts),
+            })
+        return out
+
+    def visit_histogram(self) -> dict:
+        return {str(b): self.visits[b] for b in sorted(self.visits)}
+
+    def to_dict(self, extra: bool = False) -> dict:
+        '''The stats reported by `--stats`, `extra` adds the histograms'''
+
+        stats: dict = {
+            'node_count': self.node_count,
+            'longest_branch': self.longest_branch(),
+            'k_length_prefixes': self.k_length_prefixes(),
+        }
+        if extra:
+            stats['top_kmers'] = self.top_kmers()
+            if self.kmers.ends is not None:
+                stats['k_length_suffixes'] = self.k_length_suffixes()
+            stats['fan_out'] = self.fan_out_by_depth()
+            stats['visit_histogram'] = self.visit_histogram()
+        return stats
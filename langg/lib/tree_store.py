@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+from .ttop import TreeTop
+from .word_reader import WordReader
+from ..util import consts
+from ..util import gc_pause
+from ..util import atomic_file
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import Counter
+from typing import Optional
+from weakref import WeakValueDictionary
+
+LOG: logging.Logger = logging.getLogger('tree_store')
+
+TREE_STORE_DIRNAME: str = '.trees'
+
+PROTO_SUFFIX: str = '.proto'
+
+# Uploads changing more than this fraction of the words are rebuilt rather
+#  than edited, see `build`
+MAX_EDIT_FRACTION: float = 0.5
+
+
+class TreeStore:
+    '''Content-addressed store of the bot's trees
+
+    A tree is named after the digest of what it is built from, see
+     :func:`dictionary_digest`, so uploads which only differ in case,
+     punctuation or layout share one protobuf on disk and, while any
+     translator holds it, one immutable
+     :class:`langg.lib.compact_tree.CompactTree` in memory
+
+    Attributes:
+
+        root_dir: Directory holding a `<digest>.proto` per tree
+    '''
+
+    def __init__(self, root_dir: str):
+        self.root_dir: str = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        # Trees are freed once no translator refers to them
+        self._loaded: WeakValueDictionary[str, TreeTop] = \
+            WeakValueDictionary()
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root_dir, digest + PROTO_SUFFIX)
+
+    def digest_of(self, proto_fn: str) -> Optional[str]:
+        '''Digest of a protobuf in the store, `None` for any other file'''
+
+        if os.path.dirname(os.path.abspath(proto_fn)) != \
+                os.path.abspath(self.root_dir):
+            return None
+        return os.path.basename(proto_fn)[:-len(PROTO_SUFFIX)]
+
+    def add(self, digest: str, ttop: TreeTop) -> TreeTop:
+        '''Share `ttop`, returns the tree already shared for `digest` if any'''
+
+        with self.lock:
+            return self._loaded.setdefault(digest, ttop)
+
+    def get(self, digest: str) -> Optional[TreeTop]:
+        '''The shared tree for `digest`, loaded from the store if needed'''
+
+        with self.lock:
+            ttop: TreeTop = self._loaded.get(digest)
+        if ttop is not None:
+            return ttop
+
+        ttop = TreeTop.from_protobuf(self.path(digest), compact=True)
+        if ttop is None:
+            return None
+        LOG.info(f'Loaded tree {digest}')
+        return self.add(digest, ttop)
+
+    def adopt(self, raw_fn: str, proto_fn: str) -> str:
+        '''Move a protobuf written outside the store into it
+
+        The protobuf is deleted instead if the store already has the tree
+
+        Returns: The digest of the tree
+        '''
+
+        digest: str = dictionary_digest(raw_fn)
+        if os.path.isfile(self.path(digest)):
+            LOG.info(f'Removing duplicate of tree {digest}: {proto_fn}')
+            os.remove(proto_fn)
+        else:
+            LOG.info(f'Moving {proto_fn} to the store as {digest}')
+            os.replace(proto_fn, self.path(digest))
+        return digest
+
+
+def load(proto_fn: str) -> (Optional[TreeTop], float):
+    '''Load a stored tree, compacted, in a worker process
+
+    Returns: The tree, `None` if missing, and the seconds it took
+    '''
+
+    start: float = time.perf_counter()
+    ttop: TreeTop = TreeTop.from_protobuf(proto_fn, compact=True)
+    return ttop, time.perf_counter() - start
+
+
+def dictionary_digest(fn: str) -> str:
+    '''Digest of the words the bot would build a tree from
+
+    Covers the considered and root chars and the cleaned word stream (see
+     :class:`langg.lib.word_reader.WordReader`), not the raw bytes
+    '''
+
+    # Bot trees consider and root on the same chars, see
+    #  :meth:`langg.lib.tree.Tree.for_bot`
+    chars: str = ''.join(consts.CONSIDERED_CHARS)
+    h = hashlib.sha256()
+    h.update(f'{chars}\0{chars}\0'.encode('utf-8'))
+    for word in WordReader(consts.CONSIDERED_CHARS).words(fn):
+        h.update(word.encode('utf-8') + b'\n')
+    return h.hexdigest()
+
+
+def build(raw_fn: str, root_dir: str, old_raw_fn: str = None,
+          old_ttop: TreeTop = None,
+          old_digest: str = None) -> (str, Optional[TreeTop]):
+    '''Build the tree of a dictionary into the store at `root_dir`
+
+    Self-contained so it can run in a worker process; the tree is only
+     built and returned, compacted, if the store does not have it yet.
+     Given the previous upload and its tree, stored as `old_digest`, the
+     words which changed are applied to a copy of that tree instead of
+     building from scratch. The previous upload must still be the words of
+     that tree, else the tree is built from scratch
+
+    Returns: The digest and the new tree or `None`
+    '''
+
+    digest: str = dictionary_digest(raw_fn)
+    proto_fn: str = os.path.join(root_dir, digest + PROTO_SUFFIX)
+    if os.path.isfile(proto_fn):
+        LOG.info(f'Tree {digest} already stored for {raw_fn}')
+        return digest, None
+
+    ttop: TreeTop = None
+    if old_ttop is not None and old_raw_fn and os.path.isfile(old_raw_fn):
+        if old_digest and dictionary_digest(old_raw_fn) == old_digest:
+            ttop = _edit(raw_fn, old_raw_fn, old_ttop)
+        else:
+            LOG.info(f'{old_raw_fn} is not the upload of tree {old_digest}, '
+                     f'building {raw_fn} from scratch')
+    if ttop is None:
+        ttop = TreeTop.for_bot(raw_fn)
+        ttop.parse_infiles()
+        LOG.info(f'Infiles parsed for {raw_fn}')
+        ttop.sort_trees()
+
+    # Concurrent builds of the same tree each replace the file whole
+    with atomic_file.replacing(proto_fn) as tmp_fn:
+        ttop.write_protobuf(tmp_fn)
+    LOG.info(f'Tree {digest} stored for {raw_fn}')
+
+    ttop.compact()
+    return digest, ttop
+
+
+def _edit(raw_fn: str, old_raw_fn: str,
+          old_ttop: TreeTop) -> Optional[TreeTop]:
+    '''Copy the tree of the previous upload and apply the word changes
+
+    Returns: `None` if too many words changed
+    '''
+
+    reader: WordReader = WordReader(consts.CONSIDERED_CHARS)
+    old: Counter = Counter(reader.words(old_raw_fn))
+    new: Counter = Counter(reader.words(raw_fn))
+    removed: Counter = old - new
+    added: Counter = new - old
+    n_changed: int = sum(removed.values()) + sum(added.values())
+    if n_changed > MAX_EDIT_FRACTION * sum(new.values()):
+        return None
+
+    ttop: TreeTop = TreeTop.for_bot(raw_fn)
+    tree = ttop.trees[0]
+    with gc_pause.paused():
+        # Keeps the sorted order of the old tree, only the nodes edited
+        #  below are re-sorted
+        old_ttop.trees[0].merge_into(tree.root)
+    tree.remove_words(removed.elements(), full_words=True)
+    tree.add_words(added.elements(), full_words=True)
+    LOG.info(f'Edited the tree of {old_raw_fn} for {raw_fn}: '
+             f'{n_changed} words changed')
+    return ttop
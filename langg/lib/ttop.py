@@ -1,16 +1,27 @@
 from __future__ import annotations
 
 from .tree import Tree
+from .compact_tree import CompactTree
+from . import mmap_tree
+from . import json_stream
+from . import dot_stream
 from ..util.namespace import Namespace
 import langg.proto.ttop_pb2 as ttop_pb2
+import langg.proto.ttop_v2_pb2 as ttop_v2_pb2
 
+import io
 import os
-import json
 import logging
-from typing import Optional
+from typing import (Iterable, Optional, TextIO)
 
 LOG: logging.Logger = logging.getLogger('TreeTop')
 
+# Written by `write_protobuf`, see ttop_v2.proto
+PROTO_VERSION: int = 2
+
+# First byte of a flat protobuf, the tag of `FlatTreeTop.version`
+FLAT_PROTO_TAG: bytes = b'\x08'
+
 
 class TreeTop:
     '''Container class for :class:`langg.lib.tree.Tree`s'''
@@ -43,54 +54,136 @@ class TreeTop:
             _self.trees = [Tree.from_cli(args.infiles, args)]
         return _self
 
-    def parse_infiles(self):
+    def __enter__(self) -> TreeTop:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        '''See :meth:`langg.lib.tree.Tree.close`'''
+
+        for tree in self.trees:
+            tree.close()
+
+    def index_kmers(self, k: int):
+        '''See :meth:`langg.lib.tree.Tree.index_kmers`'''
+
+        for tree in self.trees:
+            tree.index_kmers(k)
+
+    def parse_infiles(self, jobs: int = 1):
+        for tree in self.trees:
+            tree.parse_infiles(self.op_data.full, jobs)
+
+    def add_words(self, words: Iterable[str], full_words: bool = False):
+        '''See :meth:`langg.lib.tree.Tree.add_words`'''
+
+        words = list(words)
+        for tree in self.trees:
+            tree.add_words(words, full_words)
+
+    def remove_words(self, words: Iterable[str], full_words: bool = False):
+        '''See :meth:`langg.lib.tree.Tree.remove_words`'''
+
+        words = list(words)
         for tree in self.trees:
-            tree.parse_infiles(self.op_data.full)
+            tree.remove_words(words, full_words)
+
+    def merge(self, other: TreeTop):
+        '''Merge the trees of `other` into the trees of the same name'''
+
+        trees: dict[str, Tree] = {tree.name: tree for tree in self.trees}
+        for tree in other.trees:
+            if tree.name in trees:
+                trees[tree.name].merge(tree)
+            else:
+                self.trees.append(tree)
 
     @classmethod
-    def from_protobuf(cls, fn: str) -> Optional[TreeTop]:
-        '''Construct a TreeTop from a protobuf output from langg'''
+    def from_protobuf(cls, fn: str, compact: bool = False
+                      ) -> Optional[TreeTop]:
+        '''Construct a TreeTop from a protobuf output from langg
+
+        Both the flat format written by :meth:`write_protobuf` and the
+         nested one of older versions are read. With `compact` the trees are
+         loaded straight into :class:`langg.lib.compact_tree.CompactTree`s
+        '''
 
         if not os.path.isfile(fn):
             LOG.error(f'No such proto file: {fn}')
             return None
 
-        ttop = ttop_pb2.TreeTop()
         with open(fn, 'rb') as f:
-            ttop.ParseFromString(f.read())
+            data: bytes = f.read()
         _self: TreeTop = TreeTop()
+
+        if data.startswith(FLAT_PROTO_TAG):
+            ttop = ttop_v2_pb2.FlatTreeTop()
+            ttop.ParseFromString(data)
+            if ttop.version != PROTO_VERSION:
+                raise Exception(
+                    f'Unsupported protobuf version {ttop.version}: {fn}')
+            for tree in ttop.tree:
+                compact_tree: CompactTree = \
+                    CompactTree.from_flat_protobuf(tree)
+                _self.trees.append(
+                    compact_tree if compact else compact_tree.to_tree())
+            return _self
+
+        ttop = ttop_pb2.TreeTop()
+        ttop.ParseFromString(data)
+        tree_cls: type = CompactTree if compact else Tree
         for tree in ttop.tree:
-            _self.trees.append(Tree.from_protobuf(tree))
+            _self.trees.append(tree_cls.from_protobuf(tree))
+        return _self
+
+    @classmethod
+    def from_mmap(cls, fn: str) -> Optional[TreeTop]:
+        '''Construct a TreeTop viewing a file written by `write_mmap`'''
+
+        if not os.path.isfile(fn):
+            LOG.error(f'No such mmap file: {fn}')
+            return None
+
+        _self: TreeTop = TreeTop()
+        _self.trees = mmap_tree.read(fn)
         return _self
 
     @classmethod
     def from_json(cls, fn: str) -> TreeTop:
-        '''Construct a TreeTop by deserialising a JSON file'''
+        '''Construct a TreeTop by deserialising a JSON file
+
+        The nodes are built as the file is parsed, see
+         :func:`langg.lib.json_stream.load`
+        '''
 
         if not os.path.isfile(fn):
             LOG.error(f'No such JSON file: {fn}')
             return None
 
-        with open(fn, 'rb') as f:
-            ttop = json.load(f)
         _self: TreeTop = TreeTop()
-        for tree in ttop:
-            _self.trees.append(Tree.from_json(tree))
+        with open(fn, 'r') as f:
+            _self.trees = json_stream.load(f)
         return _self
 
+    def compact(self):
+        '''Swap each tree for a :class:`langg.lib.compact_tree.CompactTree`'''
+
+        self.trees = [
+            tree if isinstance(tree, CompactTree)
+            else CompactTree.from_tree(tree)
+            for tree in self.trees]
+
     # Traversal methods
 
     def sort_trees(self):
         for tree in self.trees:
             tree.sort_tree()
 
-    def statistics(self) -> dict:
+    def statistics(self, kmers: int, extra: bool = False) -> dict:
         return {
-            tree.name: {
-                'node_count': tree.node_count(),
-                'longest_branch': tree.longest_branch(),
-                'k_length_prefixes': tree.k_length_prefixes(self.args.kmers),
-            }
+            tree.name: tree.statistics(kmers, extra=extra)
             for tree in self.trees
         }
 
@@ -98,35 +191,72 @@ class TreeTop:
 
     def write_protobuf(self, fn: str):
         with open(fn, 'wb') as f:
-            f.write(self.to_protobuf().SerializeToString())
+            f.write(self.to_flat_protobuf().SerializeToString())
+
+    def to_flat_protobuf(self) -> ttop_v2_pb2.FlatTreeTop:
+        '''Serialise to a flat protobuf object, see ttop_v2.proto'''
+
+        ttop_proto = ttop_v2_pb2.FlatTreeTop()
+        ttop_proto.version = PROTO_VERSION
+        for tree in self.trees:
+            if not isinstance(tree, CompactTree):
+                tree = CompactTree.from_tree(tree)
+            tree.to_flat_protobuf(ttop_proto.tree.add())
+        return ttop_proto
 
     def to_protobuf(self) -> ttop_pb2.TreeTop:
-        '''Serialise to a protobuf object'''
+        '''Serialise to a nested protobuf object, as older versions did'''
 
         ttop_proto = ttop_pb2.TreeTop()
         for tree in self.trees:
             tree.to_protobuf(ttop_proto.tree.add())
         return ttop_proto
 
+    # Mmap methods
+
+    def write_mmap(self, fn: str):
+        '''Write the flat node table format, see :mod:`langg.lib.mmap_tree`'''
+
+        with open(fn, 'wb') as f:
+            mmap_tree.write(f, self.trees)
+
     # IO methods
 
-    def write_dot(self, fn: str):
+    def write_dot(self, fn: str, max_depth: int = None,
+                  min_visits: int = 0):
         with open(fn, 'w') as f:
-            f.write(self.to_dot())
+            self.dump_dot(f, max_depth=max_depth, min_visits=min_visits)
+
+    def dump_dot(self, f: TextIO, max_depth: int = None,
+                 min_visits: int = 0):
+        '''Stream a dotviz graph file to `f`, see
+         :func:`langg.lib.dot_stream.dump_tree`'''
+
+        dot_stream.dump(self.trees, f, max_depth=max_depth,
+                        min_visits=min_visits)
 
     def to_dot(self) -> str:
         '''Create a dotviz graph file'''
 
-        return '\n'.join([tree.to_dot() for tree in self.trees])
+        f: io.StringIO = io.StringIO()
+        self.dump_dot(f)
+        return f.getvalue()
 
     def write_json(self, fn: str):
         with open(fn, 'w') as f:
-            f.write(json.dumps(self.to_dict()))
+            self.dump_json(f)
+
+    def dump_json(self, f: TextIO, indent: int = None):
+        '''Stream JSON to `f`, see :func:`langg.lib.json_stream.dump`'''
+
+        json_stream.dump(self.trees, f, indent=indent)
 
     def to_json(self):
         '''Serialise to JSON'''
 
-        return json.dumps(self.to_dict(), indent=2)
+        f: io.StringIO = io.StringIO()
+        self.dump_json(f, indent=2)
+        return f.getvalue()
 
     def to_dict(self) -> dict:
         return [tree.to_dict() for tree in self.trees]
@@ -0,0 +1,60 @@
+from ..util import consts
+
+import re
+from typing import (Iterator, TextIO, Union)
+
+CHUNK_SIZE: int = 1 << 20
+
+
+class WordReader:
+    '''Streams the words of a dictionary file chunk by chunk
+
+    Text is lowercased, chars which are neither considered nor whitespace are
+     treated as spaces (dropping them would join quoted words) and
+     apostrophes are only kept when inside a word, not when quoting
+
+    Attributes:
+
+        chunk_size: Number of chars read from the source at a time
+    '''
+
+    def __init__(self, considered_chars: [str], chunk_size: int = CHUNK_SIZE):
+        self.chunk_size: int = chunk_size
+
+        kept: str = ''.join(
+            re.escape(c) for c in considered_chars + consts.WHITESPACE_CHARS)
+        self._non_considered: re.Pattern = re.compile(f'[^{kept}]')
+
+        # A quote is an apostrophe next to a space
+        self._quote: re.Pattern = re.compile(
+            "(?<= )'|'(?= )" if '\'' in considered_chars else '(?!)')
+
+    def words(self, source: Union[str, TextIO]) -> Iterator[str]:
+        '''Yield the words of a filename or text file-like object'''
+
+        if isinstance(source, str):
+            with open(source, 'r') as f:
+                yield from self._read(f)
+        else:
+            yield from self._read(source)
+
+    def _read(self, f: TextIO) -> Iterator[str]:
+        # Only whitespace-terminated text is split, the last whitespace char
+        #  is kept at the front of the next buffer as context for the quote
+        #  rule
+        buf: str = ''
+        while True:
+            chunk: str = f.read(self.chunk_size)
+            if not chunk:
+                break
+            buf += chunk.lower()
+            cut: int = max(buf.rfind(c) for c in consts.WHITESPACE_CHARS)
+            if cut == -1:
+                continue
+            yield from self._split(buf[:cut + 1])
+            buf = buf[cut:]
+        yield from self._split(buf)
+
+    def _split(self, text: str) -> [str]:
+        text = self._quote.sub('', text)
+        return self._non_considered.sub(' ', text).split()
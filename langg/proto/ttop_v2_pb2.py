@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: ttop_v2.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rttop_v2.proto\x12\nttop_proto\"\xde\x01\n\x0b\x46latTreeTop\x12\x0f\n\x07version\x18\x01 \x02(\r\x12*\n\x04tree\x18\x02 \x03(\x0b\x32\x1c.ttop_proto.FlatTreeTop.Tree\x1a\x91\x01\n\x04Tree\x12\x0c\n\x04name\x18\x01 \x02(\t\x12\x18\n\x10\x63onsidered_chars\x18\x02 \x03(\t\x12\x12\n\nroot_chars\x18\x03 \x03(\t\x12\r\n\x05\x63hars\x18\x04 \x02(\t\x12\x12\n\x06visits\x18\x05 \x03(\x03\x42\x02\x10\x01\x12\x12\n\x06\x64\x65pths\x18\x06 \x03(\rB\x02\x10\x01\x12\x16\n\nn_children\x18\x07 \x03(\rB\x02\x10\x01')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'ttop_v2_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _FLATTREETOP_TREE.fields_by_name['visits']._options = None
+  _FLATTREETOP_TREE.fields_by_name['visits']._serialized_options = b'\020\001'
+  _FLATTREETOP_TREE.fields_by_name['depths']._options = None
+  _FLATTREETOP_TREE.fields_by_name['depths']._serialized_options = b'\020\001'
+  _FLATTREETOP_TREE.fields_by_name['n_children']._options = None
+  _FLATTREETOP_TREE.fields_by_name['n_children']._serialized_options = b'\020\001'
+  _FLATTREETOP._serialized_start=30
+  _FLATTREETOP._serialized_end=252
+  _FLATTREETOP_TREE._serialized_start=107
+  _FLATTREETOP_TREE._serialized_end=252
+# @@protoc_insertion_point(module_scope)
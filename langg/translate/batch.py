@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from ..lib.ttop import TreeTop
+from ..util.namespace import Namespace
+from .translator import Translator
+
+import os
+import logging
+import tempfile
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import (Future, ProcessPoolExecutor)
+from itertools import islice
+from typing import (Iterable, Iterator, TextIO)
+
+LOG: logging.Logger = logging.getLogger('batch')
+
+# Lines sent to a worker at a time
+CHUNK_LINES: int = 1 << 10
+
+# Chunks queued or translated per worker, beyond which reading waits for the
+#  oldest chunk to be written
+CHUNKS_PER_JOB: int = 4
+
+# Translator of each pool worker, see `_init_worker`
+_translator: Translator = None
+
+
+def read_lines(fns: [str]) -> Iterator[str]:
+    '''Lines of each file in turn, streamed'''
+
+    for fn in fns:
+        with open(fn, 'r') as f:
+            yield from f
+
+
+def chunks(lines: Iterable[str], size: int = CHUNK_LINES) -> Iterator[[str]]:
+    it: Iterator[str] = iter(lines)
+    chunk: [str] = list(islice(it, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(it, size))
+
+
+def translate_files(ttop: TreeTop, args: Namespace, fns: [str], out: TextIO,
+                    jobs: int = 1, mmap_fn: str = None) -> int:
+    '''Translate the files `fns` line by line to `out`
+
+    Chunks of lines are translated by a pool of `jobs` processes, each with
+     its own :class:`langg.translate.translator.Translator`, and written in
+     the order they were read. A translation only depends on the tree, the
+     seed and the phrase, so the output is the same for any number of jobs.
+     At most `CHUNKS_PER_JOB` chunks per job are held at once, whatever the
+     size of the files
+
+    Workers map the trees from `mmap_fn`, the file `ttop` was read from if
+     any, else from a temporary copy written by :func:`_mmap_file`, so
+     nothing large is pickled whatever the start method of the pool
+
+    Returns: The number of lines translated
+    '''
+
+    n_lines: int = 0
+    if jobs <= 1:
+        translator: Translator = Translator.from_cli(ttop, args)
+        for chunk in chunks(read_lines(fns)):
+            n_lines += _write(out, translator.translate_lines(chunk))
+        LOG.info(f'Translation cache: {translator.cache.info()}')
+        return n_lines
+
+    with _mmap_file(ttop, mmap_fn) as tree_fn, \
+            ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                initargs=(tree_fn, args)) as pool:
+        pending: deque[Future] = deque()
+        for chunk in chunks(read_lines(fns)):
+            if len(pending) >= jobs * CHUNKS_PER_JOB:
+                n_lines += _write(out, pending.popleft().result())
+            pending.append(pool.submit(_translate_chunk, chunk))
+        while pending:
+            n_lines += _write(out, pending.popleft().result())
+    return n_lines
+
+
+def _write(out: TextIO, lines: [str]) -> int:
+    out.write('\n'.join(lines))
+    out.write('\n')
+    return len(lines)
+
+
+@contextmanager
+def _mmap_file(ttop: TreeTop, mmap_fn: str = None) -> Iterator[str]:
+    '''`mmap_fn`, or a temporary mmap file of `ttop` removed afterwards'''
+
+    if mmap_fn:
+        yield mmap_fn
+        return
+    fd, tmp_fn = tempfile.mkstemp(suffix='.mm')
+    os.close(fd)
+    try:
+        ttop.write_mmap(tmp_fn)
+        yield tmp_fn
+    finally:
+        os.remove(tmp_fn)
+
+
+def _init_worker(tree_fn: str, args: Namespace) -> None:
+    global _translator
+    _translator = Translator.from_cli(TreeTop.from_mmap(tree_fn), args)
+
+
+def _translate_chunk(lines: [str]) -> [str]:
+    return _translator.translate_lines(lines)
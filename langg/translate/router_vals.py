@@ -1,11 +1,15 @@
 from .squirrel3_rng import Squirrel3RNG
+from ..util import consts
 
-import logging as log
+import logging
+from bisect import bisect_right
 
 I32_BYTE_WIDTH: int = 4
 MERGE_WORDS_OFFSET: float = 0.92
 WORD_VARIATION_MAX: int = 3
 
+LOG: logging.Logger = logging.getLogger('router_vals')
+
 
 class RouterValues:
     '''Values used by the translator via the router
@@ -36,10 +40,17 @@ class RouterValues:
 
 
 class RouterValuesGenerator:
-    '''Used to populate :class:`langg.translate.router_vals.RouterValues`'''
+    '''Used to populate :class:`langg.translate.router_vals.RouterValues`
+
+    Attributes:
+
+        trace: Whether to log the values generated for each phrase, fixed at
+            construction so the check is free per phrase
+    '''
 
     def __init__(self, seed: int):
         self.init_seed = seed
+        self.trace: bool = LOG.isEnabledFor(consts.TRACE)
         self.rng = Squirrel3RNG()
         self.rng.seed(self.init_seed)
         # +[0, 5]%
@@ -103,18 +114,23 @@ class RouterValuesGenerator:
 
         rv.word_length = self._word_len(words)
 
-        log.debug(f'Router values: {rv}')
+        if self.trace:
+            LOG.log(consts.TRACE, 'Router values: %s', rv)
 
         return rv
 
     def contract_at(self, word: str):
         return self.rng.i32range(max=len(word) - 1, min=1)
 
-    def child_idx(self, visits: [int]) -> int:
-        if len(visits) == 0:
+    def child_idx(self, cum_visits: [int]) -> int:
+        '''Pick a child index weighted by its share of the visits
+
+        `cum_visits` is the running total of the children's visits (see
+         :meth:`langg.lib.node.Node.index_children`), the draw is the same as
+         indexing a list with each child repeated `visits` times
+        '''
+
+        if len(cum_visits) == 0:
             return -1
-        expanded = []
-        for i, visit in enumerate(visits):
-            expanded += [i] * visit
-        idx: int = self.rng.i32range(max=len(expanded) - 1)
-        return expanded[idx]
+        idx: int = self.rng.i32range(max=cum_visits[-1] - 1)
+        return bisect_right(cum_visits, idx)
@@ -4,14 +4,23 @@ from ..lib.tree import Tree
 from ..lib.ttop import TreeTop
 from ..util import consts
 from ..util.namespace import Namespace
+from ..util.lru_cache import LRUCache
 from .router_vals import (RouterValuesGenerator, RouterValues)
 
+import re
+import io
 import sys
 import logging
-from typing import (Optional, Callable)
+from typing import (Iterable, Iterator, TextIO)
 
 LOG: logging.Logger = logging.getLogger('translator')
 
+# Bytes read from stdin at a time
+STDIN_BUFFER: int = 1 << 20
+
+# Translated lines joined per write
+WRITE_BATCH: int = 1 << 10
+
 
 class LineSeparationVals:
 
@@ -57,11 +66,20 @@ class Translator:
 
         op_data: Operation data from the args provided
 
+        ttop: The :class:`langg.lib.ttop.TreeTop` translated with, kept so
+            that a TreeTop shared between translators lives as long as they
+            do, see :class:`langg.lib.tree_store.TreeStore`
+
         tree: The first tree found in the :class:`langg.lib.ttop.TreeTop`
 
         rvg: Generator of values for routing through the tree, see
             :class:`langg.translate.router_vals.RouterValuesGenerator`
 
+        cache: Words already built for a phrase, see `_build_word`
+
+        trace: Whether to log the separation values of each line, fixed at
+            construction so the check is free per line
+
     '''
 
     def __init__(self, ttop: TreeTop, args: Namespace, isbot: bool = False):
@@ -77,20 +95,33 @@ class Translator:
             raise Exception(
                 f'Tree index {str(tree_n)} specified not in TreeTop')
 
+        self.ttop: TreeTop = ttop
         self.tree: Tree = ttop.trees[tree_n]
 
         seed = self.op_data.seed or consts.DEFAULT_SEED
-        LOG.info(f'Running translator with initial seed: {seed}')
+        LOG.info('Running translator with initial seed: %s', seed)
+
+        self.trace: bool = LOG.isEnabledFor(consts.TRACE)
 
         self.rvg = RouterValuesGenerator(seed)
 
+        self._splitter: re.Pattern = Translator._line_splitter(
+            self.tree.considered_chars, isbot)
+
+        self.cache = LRUCache(self.op_data.cache_size)
+
+    @classmethod
+    def from_cli(cls, ttop: TreeTop, args: Namespace) -> Translator:
+        return Translator(ttop=ttop, args=args)
+
     @classmethod
     def for_bot(cls, ttop: TreeTop, username: str) -> Translator:
         seed: int = RouterValuesGenerator.gen_seed(
             consts.DEFAULT_SEED, username)
 
         return Translator(ttop=ttop, args=Namespace(op_data=Namespace(
-            seed=seed, tree=0, txt=None, txt_in=None)), isbot=True)
+            seed=seed, tree=0, txt=None, txt_in=None,
+            cache_size=consts.DEFAULT_CACHE_SIZE)), isbot=True)
 
     @classmethod
     def to_text(cls, lines: [[str]]):
@@ -99,12 +130,63 @@ class Translator:
         return '\n'.join(
             [''.join([word for line in lines for word in line])])
 
-    def translate_stdin(self) -> None:
-        '''Translates text from stdin'''
+    def translate_stdin(self, out: TextIO = None,
+                        flush_lines: int = None) -> None:
+        '''Translates text from stdin to `out`, stdout by default
+
+        Stdin is read in large blocks and the translated lines written in
+         batches of up to `WRITE_BATCH`. `out` is flushed every `flush_lines`
+         lines, or with each batch for `0`; by default every line if stdin is
+         a terminal, so an interactive session sees each line, and with each
+         batch otherwise
+        '''
+
+        if out is None:
+            out = sys.stdout
+        if flush_lines is None:
+            flush_lines = 1 if sys.stdin.isatty() else 0
+
+        stdin: TextIO = Translator._buffered_stdin()
+        batch: [str] = []
+        n_lines: int = 0
+        for line in self.translate_iter(stdin):
+            batch.append(line)
+            n_lines += 1
+            flush: bool = n_lines % flush_lines == 0 if flush_lines \
+                else len(batch) >= WRITE_BATCH
+            if flush or len(batch) >= WRITE_BATCH:
+                batch.append('')
+                out.write('\n'.join(batch))
+                batch.clear()
+            if flush:
+                out.flush()
+        if batch:
+            batch.append('')
+            out.write('\n'.join(batch))
+        out.flush()
+
+    @classmethod
+    def _buffered_stdin(cls) -> TextIO:
+        '''Stdin read `STDIN_BUFFER` bytes at a time, or as it is when it has
+         no file descriptor (e.g. replaced by a `StringIO`)'''
+
+        try:
+            fd: int = sys.stdin.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            return sys.stdin
+        return io.open(fd, 'r', closefd=False, buffering=STDIN_BUFFER,
+                       encoding=sys.stdin.encoding, errors=sys.stdin.errors)
+
+    def translate_iter(self, lines: Iterable[str]) -> Iterator[str]:
+        '''Translates `lines` as they are read, one string per line
 
-        for line in sys.stdin:
-            lines: [[str]] = self._translate([line])
-            print(Translator.to_text(lines))
+        Trailing whitespace, the line ending included, is dropped from each
+         line as by :meth:`translate_text`
+        '''
+
+        translate_line = self._translate_line
+        for line in lines:
+            yield ''.join(translate_line(line))
 
     def translate_text(self, txt: str) -> str:
         '''Translates text from the source specified in `op_data`'''
@@ -112,6 +194,11 @@ class Translator:
         lines: [[str]] = self._translate(txt.split('\n'))
         return Translator.to_text(lines)
 
+    def translate_lines(self, lines: [str]) -> [str]:
+        '''Translates each line on its own, see :meth:`translate_iter`'''
+
+        return list(self.translate_iter(lines))
+
     def translate_cli_input(self) -> str:
         '''Translates text from the source specified in `op_data`'''
 
@@ -121,143 +208,152 @@ class Translator:
     def _read_input(self) -> str:
         if self.op_data.txt:
             return self.op_data.txt
-        if self.op_data.txt_in:
-            data = []
-            for fn in self.op_data.txt_in:
-                with open(fn, 'r') as f:
-                    data += f.read().split()
-            return '\n'.join(data)
         raise Exception('Unknown input type')
 
+    @classmethod
+    def _line_splitter(cls, considered: [str], isbot: bool) -> re.Pattern:
+        '''Compile the pattern used by `_split_non_considered_chars`
+
+        Each match is either a `word` of considered chars or a separator of
+         non-considered chars; for the bot a separator may start with a
+         Discord `tag` (`<@!id>` or `@name`), which is kept whole even if it
+         contains considered chars
+        '''
+
+        chars: str = ''.join(re.escape(c) for c in considered)
+        word: str = f'[{chars}]+' if chars else '(?!)'
+        sep: str = f'[^{chars}]' if chars else '(?s:.)'
+
+        tags: [str] = []
+        if isbot and '<' not in considered:
+            # Up to and including the first `>`, needs a char after `<@!`
+            tags.append(r'(?<!>)<@!(?=.)[^>]*>?')
+        if isbot and '@' not in considered:
+            # Up to the next whitespace, must start a whitespace-split token
+            tags.append(r'(?<!\S)@(?=[^\W_])\S*')
+
+        # `tag` always exists, empty when there is none, so that matches
+        #  have the same groups
+        tag: str = f'(?P<tag>{"|".join(tags)}){sep}*|' if tags else '(?P<tag>)'
+        return re.compile(f'(?P<word>{word})|(?P<sep>{tag}{sep}+)', re.DOTALL)
+
     def _split_non_considered_chars(self, _line: str) -> LineSeparationVals:
         '''Splits lines in the input and records separation data'''
 
-        considered: [str] = self.tree.considered_chars
         _line = _line.rstrip()
         line = _line.lower()
         lsv = LineSeparationVals()
-        lsv.separate_first = line[0] not in considered
-
-        def _get_while(i: int, bl: bool) -> (str, int):
-            s: str = ''
-            while i < len(line) and (line[i] in considered) is bl:
-                s += line[i]
-                i += 1
-            return s, i
-
-        discord_ats: [dict] = [
-            {
-                'cond': lambda i: (
-                    line[i] == '<'
-                    and len(line) > i + 3
-                    and line[i:i+3] == '<@!'
-                ),
-                'until_fn': lambda i: i > 0 and line[i-1] == '>',
-            },
-            {
-                'cond': lambda i: (
-                    line[i] == '@'
-                    and len(line) > i + 1
-                    and line[i + 1].isalnum()
-                    and (i == 0 or line[i-1].isspace())
-                ),
-                'until_fn': lambda i: line[i].isspace(),
-            }
-        ]
-
-        def _check_discord_ats(i: int) -> Optional[dict]:
-            for at in discord_ats:
-                if at['cond'](i):
-                    return at
-            return None
-
-        def _get_while_discord_ats(
-                i: int, until_fn: Callable[[int], bool]) -> (str, int):
-            s: str = ''
-            while i < len(line) and not until_fn(i):
-                s += line[i]
-                i += 1
-            return s, i
-
-        i: int = 0
-        while i < len(line):
-            prev_i: int = i
-            if line[i] in considered:
-                start_i: int = i
-                s, i = _get_while(i, True)
-                lsv.words += [s]
-                orig_word: str = _line[start_i:i]
-                if orig_word.isupper():
-                    lsv.upper_idx_pos.append([-1])
-                else:
-                    lsv.upper_idx_pos.append(
-                        [i / len(orig_word) for i in range(len(orig_word))
-                            if orig_word[i].isupper()])
+        lsv.separate_first = False
+
+        # Lines without capitals, the common case, skip the per word checks
+        lower: bool = _line.islower()
+
+        words: [str] = lsv.words
+        separators: [str] = lsv.separators
+        upper_idx_pos: [[float]] = lsv.upper_idx_pos
+        end: int = 0
+        for word, sep, tag in self._splitter.findall(line):
+            start: int = end
+            if not word:
+                end += len(sep)
+                if not words:
+                    lsv.separate_first = True
+                separators.append(sep)
+                if self.trace and tag:
+                    LOG.log(consts.TRACE,
+                            "Adding discord tag '%s' to separators", tag)
+                continue
+
+            end += len(word)
+            words.append(word)
+            if lower:
+                upper_idx_pos.append([])
+                continue
+            orig_word: str = _line[start:end]
+            if orig_word.isupper():
+                upper_idx_pos.append([-1])
+            elif orig_word.islower():
+                upper_idx_pos.append([])
             else:
-                at: dict = None
-                ds, s = '', ''
-                if self.isbot:
-                    at = _check_discord_ats(i)
-                if self.isbot and at:
-                    ds, i = _get_while_discord_ats(i, at['until_fn'])
-                    LOG.info(f'''Adding discord tag '{ds}' to separators''')
-                s, i = _get_while(i, False)
-                lsv.separators += [ds + s]
-            if prev_i == i:
-                raise Exception('No progression in splitting string')
-
-        LOG.debug(f'LineSeparationVals: {lsv}')
+                n: int = len(orig_word)
+                upper_idx_pos.append(
+                    [i / n for i, c in enumerate(orig_word) if c.isupper()])
+
+        if self.trace:
+            LOG.log(consts.TRACE, 'LineSeparationVals: %s', lsv)
 
         return lsv
 
-    def _translate(self, lines: [str]) -> str:
+    def _build_word(self, phrase: [str]) -> (RouterValues, str, int):
+        '''Route through the tree for a phrase, before capitalisation
+
+        The result only depends on the tree, the seed and the phrase so it is
+         cached; the contraction index is drawn here, straight after the
+         word, to keep the RNG sequence of an uncached build
+
+        Returns: The router values, the word and where to contract it (`-1`
+         if the words are not merged)
+        '''
+
+        key: tuple = (self.tree, self.rvg.init_seed, *phrase)
+        built: tuple = self.cache.get(key)
+        if built is None:
+            rv: RouterValues = self.rvg.router_vals(phrase)
+            word: str = self.tree.build_word(self.rvg, rv)
+            contract_idx: int = \
+                self.rvg.contract_at(word) if rv.merge_words else -1
+            built = (rv, word, contract_idx)
+            self.cache.put(key, built)
+        return built
+
+    def _translate(self, lines: [str]) -> [[str]]:
         '''Generates a seed per phrase and traverses the tree to form words'''
 
-        output: [str] = []
-        for line in lines:
-            line_output: [str] = []
+        return [self._translate_line(line) for line in lines]
 
-            # There will always be one less separator than there are words
-            lsv: LineSeparationVals = self._split_non_considered_chars(line)
-            print(f'SPLIT LINE: {lsv}')
+    def _translate_line(self, line: str) -> [str]:
+        '''The words and separators of one translated line'''
 
-            if len(lsv.words) == 0:
-                line_output = lsv.separators.copy()
-            else:
-                i: int = 0
-                while i < len(lsv.words):
-                    phrase: [str] = lsv.words[i:i+2]
-                    rv: RouterValues = self.rvg.router_vals(phrase)
-                    word: str = self.tree.build_word(self.rvg, rv)
-
-                    # Captial letters
-                    upper_idx_pos: [float] = lsv.upper_idx_pos[i]
-
-                    # Special case for all caps word
-                    if len(upper_idx_pos) == 1 and upper_idx_pos[0] == -1:
-                        word = word.upper()
-                    else:
-                        if rv.merge_words and i + 1 < len(lsv.words):
-                            upper_idx_pos += lsv.upper_idx_pos[i + 1]
-
-                        for pos in upper_idx_pos:
-                            new_pos: int = int(pos * len(word))
-                            word = word[:new_pos] + \
-                                word[new_pos].upper() + word[new_pos + 1:]
-
-                    # Merge words
-                    if rv.merge_words:
-                        i += 1
-                        idx: int = self.rvg.contract_at(word)
-                        word = word[:idx] + '\'' + word[idx:]
-                    if lsv.separate_first:
-                        if i < len(lsv.separators) and not rv.merge_words:
-                            line_output.append(lsv.separators[i])
-                        line_output.append(word)
-                    else:
-                        line_output.append(word)
-                        if i < len(lsv.separators) and not rv.merge_words:
-                            line_output.append(lsv.separators[i])
+        line_output: [str] = []
+
+        # There will always be one less separator than there are words
+        lsv: LineSeparationVals = self._split_non_considered_chars(line)
+
+        if len(lsv.words) == 0:
+            line_output = lsv.separators.copy()
+        else:
+            i: int = 0
+            while i < len(lsv.words):
+                phrase: [str] = lsv.words[i:i+2]
+                rv, word, contract_idx = self._build_word(phrase)
+
+                # Captial letters
+                upper_idx_pos: [float] = lsv.upper_idx_pos[i]
+
+                # Special case for all caps word
+                if len(upper_idx_pos) == 1 and upper_idx_pos[0] == -1:
+                    word = word.upper()
+                else:
+                    if rv.merge_words and i + 1 < len(lsv.words):
+                        upper_idx_pos += lsv.upper_idx_pos[i + 1]
+
+                    for pos in upper_idx_pos:
+                        new_pos: int = int(pos * len(word))
+                        word = word[:new_pos] + \
+                            word[new_pos].upper() + word[new_pos + 1:]
+
+                # Merge words
+                if rv.merge_words:
                     i += 1
-            output.append(line_output)
-        return output
+                    word = word[:contract_idx] + '\'' + \
+                        word[contract_idx:]
+                if lsv.separate_first:
+                    if i < len(lsv.separators) and not rv.merge_words:
+                        line_output.append(lsv.separators[i])
+                    line_output.append(word)
+                else:
+                    line_output.append(word)
+                    if i < len(lsv.separators) and not rv.merge_words:
+                        line_output.append(lsv.separators[i])
+                i += 1
+        return line_output
@@ -3,6 +3,7 @@
 from .argp_ext import (
     AliasedSubParsersAction, SeparateNamespaceArgumentParser
 )
+from . import consts
 
 
 def parser():
@@ -12,7 +13,10 @@ def parser():
     # Input
 
     parser.add_argument('-l', '--log', '--log-level', type=str,
-                        help='Set the log level', default='DEBUG')
+                        help='Set the log level', default='WARNING')
+
+    parser.add_argument('--trace', action='store_true',
+                        help='Log the values used to translate every word')
 
     input_group = parser.add_mutually_exclusive_group()
 
@@ -26,6 +30,12 @@ def parser():
     input_group.add_argument('--json-in', '--json-infile', type=str,
                              help='Read tree data from JSON file')
 
+    input_group.add_argument('--mmap-in', '--mmap-infile', type=str,
+                             help='Map tree data from a langg mmap file')
+
+    parser.add_argument('--compact', action='store_true',
+                        help='Hold trees in flat arrays to save memory')
+
     # Subcommand setup
 
     parser.register('action', 'parsers', AliasedSubParsersAction)
@@ -54,9 +64,18 @@ def parser():
     p_gen.add_argument('--dot-outfile', type=str,
                        help='Print dotviz to given filename')
 
+    p_gen.add_argument('--dot-max-depth', type=int,
+                       help='Leave nodes deeper than this out of the dotviz')
+
+    p_gen.add_argument('--dot-min-visits', type=int, default=0,
+                       help='Leave nodes with fewer visits out of the dotviz')
+
     p_gen.add_argument('--proto-outfile', '--protobuf-outfile', type=str,
                        help='Print protobuf bin to given filename')
 
+    p_gen.add_argument('--mmap-outfile', type=str,
+                       help='Write mmap-able node table to given filename')
+
     # Behaviour
 
     p_gen.add_argument('--separate-trees', action='store_true',
@@ -71,6 +90,9 @@ def parser():
     p_gen.add_argument('--full', '--full-words', action='store_true',
                        help='Only add full words to the tree(s)')
 
+    p_gen.add_argument('-j', '--jobs', type=int, default=1,
+                       help='Number of processes building the tree(s)')
+
     # Reporting
 
     p_gen.add_argument('-k', '--kmers', type=int, default=3,
@@ -79,6 +101,10 @@ def parser():
     p_gen.add_argument('-s', '--stats', '--statistics', action='store_true',
                        help='Print some tree stats to stdout')
 
+    p_gen.add_argument('--extra-stats', action='store_true',
+                       help='Add fan-out per depth and a visit histogram to '
+                       'the stats')
+
     # -------------------------------------------------------------------------
     # Translate
     # -------------------------------------------------------------------------
@@ -108,14 +134,64 @@ def parser():
     p_trn.add_argument('--seed', type=int,
                        help='Seed to use in random number generation')
 
+    p_trn.add_argument('--cache-size', type=int,
+                       default=consts.DEFAULT_CACHE_SIZE,
+                       help='Number of translated phrases to cache, 0 for '
+                       'none')
+
+    p_trn.add_argument('-j', '--jobs', type=int, default=1,
+                       help='Number of processes translating --txt-in files')
+
     # Output
 
     p_trn.add_argument('--stdout', action='store_true',
                        help='Write translated phrases to stdout')
 
     p_trn.add_argument('--txt-outfile', type=str,
+                       help='Write translated text to given filename')
+
+    p_trn.add_argument('--flush-lines', type=int,
+                       help='Flush --stdin translations every N lines, 0 for '
+                       'only when buffered output is written, defaults to '
+                       'every line from a terminal')
+
+    # -------------------------------------------------------------------------
+    # Update
+    # -------------------------------------------------------------------------
+
+    p_upd = subparsers.add_parser('update', aliases=('upd',),
+                                  help='Add or remove words in built trees')
+
+    # Input
+
+    p_upd.add_argument('--add-infile', type=str, dest='add_infiles',
+                       action='append',
+                       help='Dictionary file whose words are added')
+
+    p_upd.add_argument('--remove-infile', type=str, dest='remove_infiles',
+                       action='append',
+                       help='Dictionary file whose words are removed')
+
+    # Behaviour
+
+    p_upd.add_argument('--full', '--full-words', action='store_true',
+                       help='The tree(s) were generated with --full')
+
+    # Output
+
+    p_upd.add_argument('--json-outfile', type=str,
                        help='Print JSON to given filename')
 
+    p_upd.add_argument('--proto-outfile', '--protobuf-outfile', type=str,
+                       help='Print protobuf bin to given filename')
+
+    p_upd.add_argument('--mmap-outfile', type=str,
+                       help='Write mmap-able node table to given filename')
+
+    # -------------------------------------------------------------------------
+    # Bot
+    # -------------------------------------------------------------------------
+
     p_bot = subparsers.add_parser('bot', help='Launch the Discord bot')
 
     p_bot.add_argument('--token', type=str, default=None,
@@ -124,6 +200,38 @@ def parser():
     p_bot.add_argument('--storage-dir', type=str, default=None,
                        help='Where to store uploaded dictionary files')
 
+    p_bot.add_argument('--executor', type=str, default='process',
+                       choices=['process', 'thread'],
+                       help='Pool used to build uploaded dictionaries')
+
+    p_bot.add_argument('--workers', type=int, default=None,
+                       help='Workers per pool, defaults to the CPU count')
+
+    p_bot.add_argument('--max-queue', type=int,
+                       default=consts.DEFAULT_BOT_MAX_QUEUE,
+                       help='Max jobs queued or running over all users')
+
+    p_bot.add_argument('--max-user-queue', type=int,
+                       default=consts.DEFAULT_BOT_MAX_USER_QUEUE,
+                       help='Max jobs queued or running per user')
+
+    p_bot.add_argument('--user-ttl', type=int,
+                       default=consts.DEFAULT_BOT_USER_TTL,
+                       help='Seconds before the tree of an idle user is '
+                       'dropped from memory')
+
+    p_bot.add_argument('--max-loaded-users', type=int, default=0,
+                       help='Max user trees held in memory, 0 for no limit')
+
+    p_bot.add_argument('--preload', action='store_true',
+                       help='Load every tree at start-up, in parallel, rather '
+                       'than on first use')
+
+    p_bot.add_argument('--write-delay', type=float,
+                       default=consts.DEFAULT_BOT_WRITE_DELAY,
+                       help='Seconds changes to user data are held before '
+                       'being written together')
+
     return parser
 
 
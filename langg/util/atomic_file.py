@@ -0,0 +1,48 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+
+# Read once, setting the umask is the only way to get it and is not
+#  thread-safe
+_UMASK: int = os.umask(0)
+os.umask(_UMASK)
+
+
+@contextmanager
+def replacing(fn: str) -> Iterator[str]:
+    '''Yield a temporary filename which replaces `fn` when the block ends
+
+    The temporary file is in the directory of `fn` so the final rename is
+     atomic: readers see the old or the new file whole, never a partial
+     write. It is removed instead if the block raises. The file keeps the
+     mode of the file it replaces, or gets the umask's for a new file,
+     rather than the `0600` of a temporary file
+    '''
+
+    fd, tmp_fn = tempfile.mkstemp(
+        dir=os.path.dirname(fn) or '.', prefix='.' + os.path.basename(fn),
+        suffix='.tmp')
+    os.close(fd)
+    try:
+        yield tmp_fn
+        os.chmod(tmp_fn, _mode(fn))
+        os.replace(tmp_fn, fn)
+    except BaseException:
+        os.remove(tmp_fn)
+        raise
+
+
+def _mode(fn: str) -> int:
+    try:
+        return os.stat(fn).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def write_text(fn: str, text: str) -> None:
+    '''Write `text` to `fn` atomically, see :func:`replacing`'''
+
+    with replacing(fn) as tmp_fn:
+        with open(tmp_fn, 'w') as f:
+            f.write(text)
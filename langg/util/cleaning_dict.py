@@ -4,9 +4,9 @@ import time
 import threading
 import logging
 
-from datetime import (datetime, date)
-from typing import Dict
+from collections import OrderedDict
 from collections.abc import MutableMapping
+from typing import (Any, Callable, Hashable, Iterator, Optional)
 
 LOG: logging.Logger = logging.getLogger('langg')
 
@@ -17,68 +17,183 @@ class RepeatTimer(threading.Timer):
             self.function(*self.args, **self.kwargs)
 
 
-class LastTouched:
-    def __init__(self, o: object):
-        self.touched: date = None
-        self.o: object = o
+class CacheEntry:
+    '''A value of a :class:`CleaningDict` and when it was last used
+
+    Attributes:
+
+        value: The stored value, possibly unloaded
+
+        touched: `time.monotonic` of the last access
+
+        loaded: Whether `value` currently holds its heavy parts
+    '''
+
+    def __init__(self, value: Any, loaded: bool = True):
+        self.value: Any = value
+        self.loaded: bool = loaded
+        self.touched: float = 0
         self.touch()
 
     def touch(self):
-        self.touched = datetime.now()
+        self.touched = time.monotonic()
 
 
 FIVE_MINUTE_S: int = 300
+ONE_HOUR_S: int = 3600
+
+
+class CleaningDict(MutableMapping):
+    '''Dict whose values are unloaded when idle or over budget
+
+    Unloading keeps the entry and its key, `unloader` only drops the heavy
+     parts of the value in place (a user's tree, not their solved words);
+     the next `[]` access calls `loader` to bring them back. Use
+     :meth:`peek` and :meth:`values`/:meth:`items`, which never load, for
+     the light parts
 
+    Attributes:
 
-class TimingDict(MutableMapping):
+        ttl: Seconds after its last access that an entry is unloaded
+
+        max_loaded: Max number of loaded entries, the least recently used
+            are unloaded beyond it, `0` for no limit
+
+        loader: Called with the key and the unloaded value, or `None` for a
+            key not in the dict, returns the loaded value or `None` if there
+            is nothing to load
+
+        unloader: Drops the heavy parts of a value in place
+
+        timer: Unloads expired entries every `interval` seconds, cancel it
+            when done with the dict
+    '''
+
+    def __init__(self,
+                 ttl: float = ONE_HOUR_S,
+                 max_loaded: int = 0,
+                 loader: Callable[[Hashable, Any], Optional[Any]] = None,
+                 unloader: Callable[[Any], None] = None,
+                 interval: float = FIVE_MINUTE_S):
+        self.ttl: float = ttl
+        self.max_loaded: int = max_loaded
+        self.loader = loader or (lambda k, v: v)
+        self.unloader = unloader or (lambda v: None)
 
-    def __init__(self, interval: int = FIVE_MINUTE_S, *args, **kwargs):
         self.lock = threading.Lock()
-        self.store: Dict[int, LastTouched] = dict()
-        self.update(dict(*args, **kwargs))
+        # Least recently used first
+        self.store: OrderedDict[Hashable, CacheEntry] = OrderedDict()
         self.timer = RepeatTimer(interval, self._clean)
+        self.timer.daemon = True
         self.timer.start()
 
-    def _clean(self):
-        now: date = datetime.now()
+    def _clean(self) -> None:
+        '''Unload the entries not accessed for `ttl` seconds'''
+
+        expired: float = time.monotonic() - self.ttl
         with self.lock:
-            for k in list(self.store.keys()):
-                LOG.debug(
-                    f'Cleaning {{key: {k}, time: {self.store[k].touched}}}')
-                if self.store[k].touched < now:
-                    del self.store[k]
+            for k, entry in self.store.items():
+                if entry.touched < expired:
+                    self._unload(k, entry)
+
+    def _unload(self, k: Hashable, entry: CacheEntry) -> None:
+        if entry.loaded:
+            LOG.debug(f'Unloading {{key: {k}, time: {entry.touched}}}')
+            self.unloader(entry.value)
+            entry.loaded = False
+
+    def _evict(self) -> None:
+        '''Unload the least recently used entries over `max_loaded`'''
+
+        if self.max_loaded <= 0:
+            return
+        n: int = sum(entry.loaded for entry in self.store.values())
+        for k, entry in self.store.items():
+            if n <= self.max_loaded:
+                break
+            if entry.loaded:
+                self._unload(k, entry)
+                n -= 1
 
     def __getitem__(self, key):
         with self.lock:
-            lt: LastTouched = self.store[key]
-            lt.touch()
-            return lt.o
+            entry: CacheEntry = self.store.get(key)
+            if entry is not None and entry.loaded:
+                entry.touch()
+                self.store.move_to_end(key)
+                return entry.value
+
+        # Loading can be slow, don't hold up other keys meanwhile
+        value = self.loader(key, entry.value if entry else None)
+        if value is None:
+            raise KeyError(key)
+
+        with self.lock:
+            self.store[key] = CacheEntry(value)
+            self.store.move_to_end(key)
+            self._evict()
+        return value
 
     def __setitem__(self, k, v):
         with self.lock:
-            self.store[k] = LastTouched(v)
+            self.store[k] = CacheEntry(v)
+            self.store.move_to_end(k)
+            self._evict()
+
+    def set_unloaded(self, k, v) -> None:
+        '''Add a value whose heavy parts will be loaded on first access'''
+
+        with self.lock:
+            self.store[k] = CacheEntry(v, loaded=False)
+            self.store.move_to_end(k, last=False)
 
     def __delitem__(self, key):
         with self.lock:
             del self.store[key]
 
-    # This is questionable
-    def __iter__(self):
+    def __contains__(self, key) -> bool:
+        return key in self.store
+
+    def peek(self, key, default=None):
+        '''The value of `key`, loaded or not, without loading or touching'''
+
+        entry: CacheEntry = self.store.get(key)
+        return default if entry is None else entry.value
+
+    def loaded(self, key) -> bool:
+        entry: CacheEntry = self.store.get(key)
+        return entry is not None and entry.loaded
+
+    def values(self) -> [Any]:
+        '''See :meth:`peek`'''
+
+        with self.lock:
+            return [entry.value for entry in self.store.values()]
+
+    def items(self) -> [(Hashable, Any)]:
+        '''See :meth:`peek`'''
+
+        with self.lock:
+            return [(k, entry.value) for k, entry in self.store.items()]
+
+    def __iter__(self) -> Iterator:
         with self.lock:
-            return iter(self.store)
+            return iter(list(self.store))
 
     def __len__(self):
         return len(self.store)
 
 
 if __name__ == '__main__':
-    d = TimingDict(interval=2)
-    d['k1'] = 'v1'
-    d['k2'] = 'v2'
-    for k, v in d.items():
-        print(k, v)
-    time.sleep(2)
-    d['k3'] = 'v3'
-    for k, v in d.items():
-        print(k, v)
+    d = CleaningDict(
+        ttl=1, max_loaded=2, interval=1,
+        loader=lambda k, v: (v or k).upper(),
+        unloader=lambda v: print(f'Unloading {v}'))
+    d['k1'] = 'V1'
+    d['k2'] = 'V2'
+    d['k3'] = 'V3'
+    print({k: d.loaded(k) for k in d})
+    time.sleep(2.5)
+    print({k: d.loaded(k) for k in d})
+    print(d['k1'], d['k4'])
     d.timer.cancel()
@@ -6,3 +6,27 @@ WHITESPACE_CHARS = list(string.whitespace)
 
 # This should be randomised, but is fixed during testing
 DEFAULT_SEED: int = 0x73C92AD5
+
+# Phrases whose translation is kept per translator, see `Translator.cache`
+DEFAULT_CACHE_SIZE: int = 4096
+
+# Log level below DEBUG for per-line/per-word translation values, only
+#  formatted when enabled (`--trace`)
+TRACE: int = 5
+
+# Bot jobs allowed to queue or run at once, in total and per user, see
+#  `langg.bot.job_runner.JobRunner`
+DEFAULT_BOT_MAX_QUEUE: int = 64
+DEFAULT_BOT_MAX_USER_QUEUE: int = 2
+
+# Seconds before the tree of an idle bot user is dropped, see
+#  `langg.util.cleaning_dict.CleaningDict`
+DEFAULT_BOT_USER_TTL: int = 3600
+
+# Seconds changed bot user data waits so that a burst of changes is written
+#  once, see `langg.bot.persistence.WriteBehind`
+DEFAULT_BOT_WRITE_DELAY: float = 5.0
+
+# Seconds a Discord user ID stays resolved to its userhash, see
+#  `langg.bot.user_index.UserIndex`
+DEFAULT_BOT_USER_ID_TTL: int = 600
@@ -0,0 +1,20 @@
+import gc
+from contextlib import contextmanager
+
+
+@contextmanager
+def paused():
+    '''Suspend the cyclic garbage collector for the duration of the block
+
+    Building or loading a tree allocates hundreds of thousands of long-lived
+     objects and no cycles, the collector would otherwise rescan all of them
+     repeatedly as the allocation count grows
+    '''
+
+    enabled: bool = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
@@ -0,0 +1,57 @@
+from collections import OrderedDict
+from typing import (Any, Hashable)
+
+
+class LRUCache:
+    '''Bounded mapping which evicts the least recently used entry
+
+    Attributes:
+
+        maxsize: Maximum number of entries, `0` disables the cache
+
+        hits: Number of `get` calls which found their key
+
+        misses: Number of `get` calls which did not
+    '''
+
+    def __init__(self, maxsize: int):
+        self.maxsize: int = maxsize
+        self.hits: int = 0
+        self.misses: int = 0
+        self.store: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            value = self.store[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.store.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        self.store[key] = value
+        self.store.move_to_end(key)
+        if len(self.store) > self.maxsize:
+            self.store.popitem(last=False)
+
+    def clear(self) -> None:
+        self.store.clear()
+        self.hits = self.misses = 0
+
+    def info(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.store),
+            'maxsize': self.maxsize,
+        }
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.store
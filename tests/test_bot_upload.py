@@ -0,0 +1,121 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('discord')
+
+from langg.bot.bot import BotWrapper  # noqa: E402
+from langg.lib.ttop import TreeTop  # noqa: E402
+from langg.util.namespace import Namespace  # noqa: E402
+
+WORDS: [str] = [
+    'apple', 'banana', 'cherry', 'damson', 'elder', 'fig', 'grape', 'guava',
+    'kiwi', 'lemon', 'lime', 'mango', 'melon', 'olive', 'peach', 'pear',
+    'plum', 'quince', 'raisin', 'sloe']
+
+
+class Upload:
+    '''Attachment saving `data`, raising `error` after the first `n_bytes`'''
+
+    def __init__(self, data: bytes, n_bytes: int = None,
+                 error: Exception = None):
+        self.filename: str = 'words.txt'
+        self.data: bytes = data
+        self.n_bytes: int = len(data) if n_bytes is None else n_bytes
+        self.error: Exception = error
+
+    async def save(self, fn: str) -> None:
+        with open(fn, 'wb') as f:
+            f.write(self.data[:self.n_bytes])
+        if self.error is not None:
+            raise self.error
+
+
+class Author:
+    id: int = 1234
+
+    def __str__(self) -> str:
+        return 'user#1234'
+
+
+def _ctx(upload: Upload) -> SimpleNamespace:
+    async def send(**kwargs):
+        pass
+
+    return SimpleNamespace(
+        author=Author(), send=send,
+        message=SimpleNamespace(attachments=[upload], content=''))
+
+
+def _words(words: [str]) -> bytes:
+    return ''.join(w + '\n' for w in words).encode('utf-8')
+
+
+def _columns(ttop: TreeTop) -> ([str], [int]):
+    tree = ttop.trees[0]
+    return list(tree.chars), list(tree.visits)
+
+
+def _fresh(tmp_path, data: bytes) -> ([str], [int]):
+    fn = tmp_path / 'fresh.txt'
+    fn.write_bytes(data)
+    ttop: TreeTop = TreeTop.for_bot(str(fn))
+    ttop.parse_infiles()
+    ttop.sort_trees()
+    ttop.compact()
+    return _columns(ttop)
+
+
+def _run_uploads(tmp_path, uploads: [Upload]) -> (BotWrapper, [Exception]):
+    errors: [Exception] = []
+
+    async def run() -> BotWrapper:
+        bot: BotWrapper = BotWrapper(Namespace(
+            token='token', storage_dir=str(tmp_path / 'storage'),
+            executor='thread', workers=1, max_queue=4, max_user_queue=1,
+            user_ttl=3600, max_loaded_users=0, write_delay=0))
+        bot.data.timer.cancel()
+        for upload in uploads:
+            try:
+                await bot.cmd_dictionary(_ctx(upload))
+                errors.append(None)
+            except Exception as e:
+                errors.append(e)
+        bot.jobs.shutdown()
+        return bot
+
+    return asyncio.run(run()), errors
+
+
+def _user_tree(bot: BotWrapper) -> ([str], [int]):
+    return _columns(bot.data['user#1234'].translator.ttop)
+
+
+@pytest.mark.parametrize('failed', [
+    Upload(_words(WORDS + ['yam']), n_bytes=100, error=OSError('cut off')),
+    Upload(b'\xff\xfe not utf-8 \xff\n'),
+])
+def test_failed_upload_then_reupload(tmp_path, failed: Upload):
+    old: bytes = _words(WORDS)
+    new: bytes = _words(WORDS + ['yam'])
+    bot, errors = _run_uploads(
+        tmp_path, [Upload(old), failed, Upload(new)])
+
+    assert errors[0] is None and errors[1] is not None and errors[2] is None
+    assert _user_tree(bot) == _fresh(tmp_path, new)
+    raw_fn: str = bot.data['user#1234'].raw_fn
+    with open(raw_fn, 'rb') as f:
+        assert f.read() == new
+
+
+def test_failed_upload_keeps_previous_upload(tmp_path):
+    old: bytes = _words(WORDS)
+    bot, errors = _run_uploads(tmp_path, [
+        Upload(old),
+        Upload(_words(WORDS[:-1]), n_bytes=50, error=OSError('cut off'))])
+
+    assert errors[1] is not None
+    assert _user_tree(bot) == _fresh(tmp_path, old)
+    with open(bot.data['user#1234'].raw_fn, 'rb') as f:
+        assert f.read() == old
@@ -0,0 +1,47 @@
+import io
+import json
+
+import pytest
+
+from langg.lib import json_stream
+from langg.lib.tree import Tree
+
+
+def _trees() -> [Tree]:
+    tree: Tree = Tree.for_bot('words.txt')
+    tree.add_words(['abc', 'abd', 'bca', "it's"])
+    tree.sort_tree()
+    return [tree]
+
+
+def _events(text: str, chunk_size: int) -> list:
+    return list(json_stream.events(io.StringIO(text), chunk_size))
+
+
+def test_adjacent_scalars_across_chunks():
+    assert _events('[1, 2, 3, 45, 6]', 1) == [
+        ('start_array', None),
+        ('value', 1), ('value', 2), ('value', 3), ('value', 45),
+        ('value', 6),
+        ('end_array', None)]
+
+
+@pytest.mark.parametrize('indent', [None, 2])
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 7, 64])
+def test_dump_events_round_trip(indent: int, chunk_size: int):
+    f: io.StringIO = io.StringIO()
+    json_stream.dump(_trees(), f, indent=indent)
+    text: str = f.getvalue()
+
+    assert _events(text, chunk_size) == _events(text, len(text) + 1)
+
+    trees: [Tree] = json_stream.load(io.StringIO(text))
+    assert json.dumps([t.to_dict() for t in trees], indent=indent) == text
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3])
+def test_strings_across_chunks(chunk_size: int):
+    text: str = '{"a, b": ["x\\"y", "", "z: w"], "c": [true, null, -1.5]}'
+    assert _events(text, chunk_size) == _events(text, len(text) + 1)
+    values: list = [v for e, v in _events(text, chunk_size) if e == 'value']
+    assert values == ['x"y', '', 'z: w', True, None, -1.5]
@@ -0,0 +1,71 @@
+import io
+import sys
+
+import pytest
+
+from langg.lib.tree import Tree
+from langg.lib.ttop import TreeTop
+from langg.translate import translator as translator_mod
+from langg.translate.translator import Translator
+from langg.util.namespace import Namespace
+
+LINES: [str] = [f'line {i} of the input' for i in range(50)]
+
+
+class CountingOut(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.flushed_at: [int] = []
+
+    def flush(self) -> None:
+        self.flushed_at.append(self.getvalue().count('\n'))
+
+
+def _translator() -> Translator:
+    ttop: TreeTop = TreeTop()
+    tree: Tree = Tree.for_bot('words')
+    tree.add_words(['line', 'of', 'the', 'input', 'words'], full_words=True)
+    tree.sort_tree()
+    ttop.trees = [tree]
+    return Translator(ttop, Namespace(op_data=Namespace(
+        seed=None, tree=0, txt=None, txt_in=None, cache_size=16)))
+
+
+@pytest.fixture
+def stdin_file(tmp_path, monkeypatch):
+    fn = tmp_path / 'stdin.txt'
+    fn.write_text(''.join(line + '\n' for line in LINES))
+    with open(fn) as f:
+        monkeypatch.setattr(sys, 'stdin', f)
+        yield f
+
+
+def _expected() -> str:
+    return ''.join(line + '\n' for line in _translator().translate_iter(LINES))
+
+
+def test_flush_lines_beyond_write_batch(stdin_file, monkeypatch):
+    monkeypatch.setattr(translator_mod, 'WRITE_BATCH', 4)
+    out: CountingOut = CountingOut()
+    _translator().translate_stdin(out, flush_lines=10)
+
+    assert out.getvalue() == _expected()
+    assert out.flushed_at == [10, 20, 30, 40, 50, 50]
+
+
+def test_flush_with_each_batch(stdin_file, monkeypatch):
+    monkeypatch.setattr(translator_mod, 'WRITE_BATCH', 16)
+    out: CountingOut = CountingOut()
+    _translator().translate_stdin(out, flush_lines=0)
+
+    assert out.getvalue() == _expected()
+    assert out.flushed_at == [16, 32, 48, 50]
+
+
+def test_stdin_without_file_descriptor(monkeypatch):
+    monkeypatch.setattr(
+        sys, 'stdin', io.StringIO(''.join(line + '\n' for line in LINES)))
+    out: io.StringIO = io.StringIO()
+    _translator().translate_stdin(out)
+
+    assert out.getvalue() == _expected()
@@ -0,0 +1,33 @@
+from langg.lib import tree_store
+from langg.lib.ttop import TreeTop
+
+
+def _columns(ttop: TreeTop) -> ([str], [int]):
+    tree = ttop.trees[0]
+    return list(tree.chars), list(tree.visits)
+
+
+def _store(path) -> str:
+    path.mkdir()
+    return str(path)
+
+
+def _write(path, words: [str]) -> str:
+    path.write_text(''.join(w + '\n' for w in words))
+    return str(path)
+
+
+def test_edit_needs_the_upload_of_the_old_tree(tmp_path):
+    root_dir: str = _store(tmp_path / 'trees')
+    old_fn: str = _write(tmp_path / 'old.txt', ['apple', 'banana', 'cherry'])
+    old_digest, old_ttop = tree_store.build(old_fn, root_dir)
+
+    # The previous upload on disk is not what the old tree was built from
+    other_fn: str = _write(tmp_path / 'other.txt', ['apple', 'banana'])
+    new_fn: str = _write(tmp_path / 'new.txt',
+                         ['apple', 'banana', 'cherry', 'damson'])
+    _, edited = tree_store.build(
+        new_fn, _store(tmp_path / 'edited'), other_fn, old_ttop, old_digest)
+    _, fresh = tree_store.build(new_fn, _store(tmp_path / 'fresh'))
+
+    assert _columns(edited) == _columns(fresh)
@@ -0,0 +1,49 @@
+from langg.lib.node import Node
+from langg.lib.tree import Tree
+
+
+def _paths(tree: Tree) -> dict:
+    '''Visits of every node of `tree` by path'''
+
+    paths: dict = {'': tree.root.visits}
+    stack: [(str, Node)] = [('', tree.root)]
+    while stack:
+        path, node = stack.pop()
+        for char, child in node.children.items():
+            paths[path + char] = child.visits
+            stack.append((path + char, child))
+    return paths
+
+
+def _tree(words: [str], full_words: bool = False) -> Tree:
+    tree: Tree = Tree.for_bot('words')
+    tree.index_kmers(2)
+    tree.add_words(words, full_words)
+    return tree
+
+
+def test_remove_absent_word_leaves_tree_unchanged():
+    tree: Tree = _tree(['abc'])
+    before: dict = _paths(tree)
+    counts: dict = dict(tree.kmers.counts)
+
+    assert tree.remove_words(['xbc']) == 0
+    assert _paths(tree) == before
+    assert dict(tree.kmers.counts) == counts
+
+
+def test_remove_absent_full_word_leaves_tree_unchanged():
+    tree: Tree = _tree(['abc'], full_words=True)
+    before: dict = _paths(tree)
+
+    assert tree.remove_words(['xbc'], full_words=True) == 0
+    assert _paths(tree) == before
+
+
+def test_remove_added_word_restores_tree():
+    tree: Tree = _tree(['abc', 'bcd'])
+    before: dict = _paths(tree)
+
+    assert tree.add_words(['xbc']) == 1
+    assert tree.remove_words(['xbc', 'xyz']) == 1
+    assert _paths(tree) == before